@@ -71,6 +71,7 @@ import digitalio
 import busio
 from adafruit_bus_device.i2c_device import I2CDevice
 from time import sleep
+from adafruit_ticks import ticks_ms, ticks_add, ticks_diff
 import json
 
 from i2cdisplaybus import I2CDisplayBus
@@ -95,6 +96,10 @@ import board
 import supervisor
 import math
 import os
+import binascii
+import struct
+from array import array
+import ymf825_codec
 
 ##########################################
 # Get 8encoder status in async task
@@ -105,70 +110,106 @@ async def get_8encoder():
         on_change = False
         
         try:
-            enc_switch  = Encoder_obj.get_switch()
-            change = (M5Stack_8Encoder_class.status['switch'] != enc_switch)
-            on_change = on_change or change
-            M5Stack_8Encoder_class.status['on_change']['switch'] = change
-            M5Stack_8Encoder_class.status['switch'] = enc_switch
-            await asyncio.sleep(0.02)
-            
-            for rt in list(range(8)):
-                enc_rotary = Encoder_obj.get_rotary_increment(rt)
-                change = (enc_rotary != 0)
-                on_change = on_change or change
-                M5Stack_8Encoder_class.status['on_change']['rotary_inc'][rt] = change
-                M5Stack_8Encoder_class.status['rotary_inc'][rt] = enc_rotary
-                await asyncio.sleep(0.02)
-    
-            Encoder_obj.i2c_unlock()
-
-            if on_change:
-                Application.task_8encoder()
+            # Read the switch and all rotary increments at once
+            enc_switch, enc_rotaries = Encoder_obj.scan()
         
         finally:
             Encoder_obj.i2c_unlock()
 
+        change = (M5Stack_8Encoder_class.status['switch'] != enc_switch)
+        on_change = on_change or change
+        M5Stack_8Encoder_class.status['on_change']['switch'] = change
+        M5Stack_8Encoder_class.status['switch'] = enc_switch
+
+        for rt in list(range(8)):
+            enc_rotary = enc_rotaries[rt]
+            change = (enc_rotary != 0)
+            on_change = on_change or change
+            M5Stack_8Encoder_class.status['on_change']['rotary_inc'][rt] = change
+            M5Stack_8Encoder_class.status['rotary_inc'][rt] = enc_rotary
+
+        if on_change:
+            await Application.task_8encoder()
+
         # Gives away process time to the other tasks.
         # If there is no task, let give back process time to me.
-        await asyncio.sleep(0.02)
+        await asyncio.sleep(Encoder_obj.scan_interval)
 
 ##########################################
 # MIDI IN in async task
 ##########################################
 async def midi_in():
+    # Raw MIDI events (status << 16 | data1 << 8 | data2) received in a turn
+    midi_events = array('L', [0]*MIDI_class.RECEIVE_BUDGET)
+
+    # Event handlers indexed by the status nibble
+    handlers = YMF825_obj.midi_event_handlers
     while True:
-        midi_msg = MIDI_obj.midi_in()
-        if midi_msg is not None:
-#            print('===>MIDI IN:', midi_msg)
-            if isinstance(midi_msg, NoteOn):
-#                print('NOTE ON :', midi_msg.note, midi_msg.velocity)
-                YMF825_obj.note_on(midi_msg.note, midi_msg.velocity)
+        # Dispatch all the events received before giving away the process time
+        count = await MIDI_obj.midi_in_raw_async(midi_events)
 
-            elif isinstance(midi_msg, NoteOff):
-#                print('NOTE OFF:', midi_msg.note)
-                YMF825_obj.note_off(midi_msg.note)
+        # The register writes for the events are sent together
+        YMF825_obj.txn_begin()
+        for ev in range(count):
+            event = midi_events[ev]
+#            print('===>MIDI IN:', hex(event))
+            handler = handlers[(event >> 20) & 0x0f]
+            if handler is not None:
+                handler(event)
 
-#            elif isinstance(midi_msg, PitchBend):
-#                YMF825_obj.pitch_bend(0)
+        YMF825_obj.txn_end()
 
         # Gives away process time to the other tasks.
         # If there is no task, let give back process time to me.
         await asyncio.sleep(0.0)
 
+##########################################
+# Upload the edited sound in async task
+##########################################
+async def upload_edits():
+    while True:
+        # Upload the latest edits, at most once in an interval
+        await YMF825_obj.send_edits()
+        await asyncio.sleep(YMF825_obj.edit_upload_interval)
+
+##########################################
+# MIDI program change in async task
+##########################################
+async def program_change():
+    while True:
+        # Load the program requested or prefetch a sound, then show the new sound
+        if YMF825_obj.change_program():
+            Application.show_program()
+
+        await asyncio.sleep(YMF825_obj.prefetch_interval)
+
 ##########################################
 # Asyncronous functions
 ##########################################
 async def main():
-    interrupt_get_8encoder = asyncio.create_task(get_8encoder())
-    interrupt_midi_in      = asyncio.create_task(midi_in())
+    interrupt_get_8encoder  = asyncio.create_task(get_8encoder())
+    interrupt_midi_in       = asyncio.create_task(midi_in())
+    interrupt_upload_edits  = asyncio.create_task(upload_edits())
+    interrupt_program_change = asyncio.create_task(program_change())
   
-    await asyncio.gather(interrupt_get_8encoder, interrupt_midi_in)
+    await asyncio.gather(interrupt_get_8encoder, interrupt_midi_in, interrupt_upload_edits, interrupt_program_change)
 
 
 ###################################
 # CLASS: USB MIDI
 ###################################
 class MIDI_class:
+    # Maximum number of MIDI messages dispatched in one turn of midi_in()
+    RECEIVE_BUDGET = 16
+
+    # USB MIDI host read timeout in seconds (near-zero, idle time is given to the other tasks)
+    USB_HOST_POLL_TIMEOUT = 0.001
+
+    # Receive modes
+    RECEIVE_ONE  = 0				# A MIDIMessage object
+    RECEIVE_MANY = 1				# A list of MIDIMessage objects
+    RECEIVE_RAW  = 2				# Raw events in an int array
+
     # Constructor
     #   USB MIDI
     #     usb_midi_host_port: A tuple of (D+, D-)
@@ -227,7 +268,8 @@ class MIDI_class:
                         print('Found', hex(device.idVendor), hex(device.idProduct))
 
 #                    self._raw_midi_host = MIDI(device)				# bloking mode
-                    self._raw_midi_host = MIDI(device, 0.05)		# none-blocking mode
+#                    self._raw_midi_host = MIDI(device, 0.05)		# none-blocking mode
+                    self._raw_midi_host = MIDI(device, MIDI_class.USB_HOST_POLL_TIMEOUT)		# polling mode for the async reads
 #                    self._raw_midi_host = MIDI(device, 0.1)		# none-blocking mode
                     if self._init:
                         print('CONNECT MIDI')
@@ -265,29 +307,77 @@ class MIDI_class:
         return self._usb_midi_host
        
     # MIDI-IN via a port of the current mode
-    def midi_in(self):            
+    def midi_in(self):
+        return self._receive(MIDI_class.RECEIVE_ONE)
+
+    # MIDI-IN all the messages buffered in a port of the current mode (up to budget messages).
+    #   Returns a list of MIDIMessage objects (reused by the next call).
+    #   The midi_in() task drains the port with midi_in_raw_async(), the same batch as raw events.
+    def midi_in_many(self, budget=RECEIVE_BUDGET):
+        return self._receive(MIDI_class.RECEIVE_MANY, budget)
+
+    # MIDI-IN all the messages buffered in a port of the current mode as raw events.
+    #   events: Preallocated int array, each event is status << 16 | data1 << 8 | data2
+    #           (| cable << 24 in USB host mode)
+    #   Returns the number of events stored.
+    def midi_in_raw(self, events):
+        return self._receive(MIDI_class.RECEIVE_RAW, events)
+
+    # MIDI-IN all the raw events buffered without blocking the other tasks (see midi_in_raw()).
+    #   In USB host mode this waits for events while the other tasks run.
+    async def midi_in_raw_async(self, events):
+        if self._midi_in_usb and self._usb_host_mode:
+            try:
+                return await self._raw_midi_host.read_events_async(events)
+
+            except Exception as e:
+                self._change_to_device_mode(e)
+
+        return self.midi_in_raw(events)
+
+    # Receive in a mode
+    def _receive(self, mode, arg=None):
         # MIDI-IN via USB
         if self._midi_in_usb:
             try:
                 if self._usb_host_mode:
-                    midi_msg = self._usb_midi_host.receive()
-                else:
-                    midi_msg = self._usb_midi.receive()
+                    # Raw events are decoded from the USB-MIDI event packets directly
+                    if mode == MIDI_class.RECEIVE_RAW:
+                        return self._raw_midi_host.read_events(arg)
+
+                    return MIDI_class._receive_port(self._usb_midi_host, mode, arg)
+
+                return MIDI_class._receive_port(self._usb_midi, mode, arg)
 
             except Exception as e:
-                print('CHANGE TO DEVICE MODE:', e)
-                Application_class.DISPLAY_TEXTS[0][4] = 'HOST' if MIDI_obj.as_host() else 'DEV'
-                Application_class.DISPLAY_LABELS[0][4].text = Application_class.DISPLAY_TEXTS[0][4]
-                Encoder_obj.i2c_lock()
-                Encoder_obj.led(8, [0x80, 0x00, 0xff])
-                Encoder_obj.i2c_unlock()
+                self._change_to_device_mode(e)
+                return MIDI_class._receive_port(self._usb_midi, mode, arg)
 
-                self._usb_host_mode = False
-                midi_msg = self._usb_midi.receive()
-                
-            return midi_msg
+        if mode == MIDI_class.RECEIVE_RAW:
+            return 0
+
+        return () if mode == MIDI_class.RECEIVE_MANY else None
+
+    # Fall back to USB MIDI device mode when the host port failed
+    def _change_to_device_mode(self, e):
+        print('CHANGE TO DEVICE MODE:', e)
+        Application_class.DISPLAY_TEXTS[0][4] = 'HOST' if MIDI_obj.as_host() else 'DEV'
+        Application_class.DISPLAY_LABELS[0][4].text = Application_class.DISPLAY_TEXTS[0][4]
+        Encoder_obj.i2c_lock()
+        Encoder_obj.led(8, [0x80, 0x00, 0xff])
+        Encoder_obj.i2c_unlock()
+
+        self._usb_host_mode = False
+
+    @staticmethod
+    def _receive_port(midi_port, mode, arg):
+        if mode == MIDI_class.RECEIVE_RAW:
+            return midi_port.receive_raw(arg)
+
+        if mode == MIDI_class.RECEIVE_MANY:
+            return midi_port.receive_many(arg)
 
-        return None
+        return midi_port.receive()
 
 ###################################
 # CLASS: 8Encoder Unit for M5Stack
@@ -295,8 +385,17 @@ class MIDI_class:
 class M5Stack_8Encoder_class:
     status = {'switch': None, 'rotary_inc': [None]*8, 'on_change':{'switch': False, 'rotary_inc': [False]*8}}
     
-    def __init__(self, scl=GP7, sda=GP6, i2c_address=0x41):
+    def __init__(self, scl=GP7, sda=GP6, i2c_address=0x41, scan_interval=0.02):
         self._i2c_address = i2c_address
+        self.scan_interval = scan_interval		# Seconds between scans in get_8encoder()
+
+        # Buffers for the bulk scan (allocated once)
+        self._reg_increment = bytearray([0x20])
+        self._reg_switch = bytearray([0x60])
+        self._increment_buf = bytearray(32)		# 8 rotaries x 4 bytes (0x20..0x3F)
+        self._switch_buf = bytearray(1)
+        self._increments = [0]*8
+
         self._i2c = busio.I2C(scl, sda)			# board.I2C does NOT work for PICO, use busio.I2C
         self.i2c_lock()
         dev_hex = hex(i2c_address)
@@ -377,6 +476,21 @@ class M5Stack_8Encoder_class:
 
         return M5Stack_8Encoder_class.__bits_to_int(v, 32)
 
+    # Read the switch and all the rotary increments.
+    #   The increment block (0x20..0x3F) is read in one auto-increment transfer.
+    #   Returns (switch, increments), the increments list is reused in every scan.
+    def scan(self):
+        self._i2c.writeto_then_readfrom(self._i2c_address, self._reg_increment, self._increment_buf)
+        self._i2c.writeto_then_readfrom(self._i2c_address, self._reg_switch, self._switch_buf)
+
+        buf = self._increment_buf
+        for rt in list(range(8)):
+            base = rt * 4
+            # Signed 32bit little endian (sign extended with the top byte to keep small integers)
+            self._increments[rt] = (((buf[base + 3] ^ 0x80) - 0x80) << 24) | (buf[base + 2] << 16) | (buf[base + 1] << 8) | buf[base]
+
+        return int(self._switch_buf[0]), self._increments
+
     # Turn on a LED in colro(R,G,B)
     def led(self, led_num, color=[0x00, 0x00, 0x00]):
         base = [0x70 + led_num * 3]
@@ -488,6 +602,628 @@ class OLED_SH1107_128x128_class:
     def new_label(self, txt='', tx=0, ty=0, tcol=0xFFFFFF):
         return self.new_label_xy(txt, tx * self._FONT_WIDTH, ty * self._LINE_HEIGHT, tcol)
 
+    # A bitmap of 2 colors (0: transparent, 1: white) at a dot position.
+    #   Returns (bitmap, tile grid to append)
+    def new_bitmap(self, tx, ty, width, height):
+        bitmap = displayio.Bitmap(width, height, 2)
+        palette = displayio.Palette(2)
+        palette[0] = 0x000000
+        palette[1] = 0xFFFFFF
+        palette.make_transparent(0)
+        return (bitmap, displayio.TileGrid(bitmap, pixel_shader=palette, x=tx, y=ty))
+
+
+###################################
+# CLASS: Voice allocator for YMF825
+###################################
+class Voice_allocator_class:
+    # Steal policies
+    STEAL_OLDEST          = 'oldest'		# The voice with the oldest note on (released or playing)
+    STEAL_RELEASED_FIRST  = 'released'		# Released voices first, then the oldest playing note
+    STEAL_RETRIGGER       = 'retrigger'		# Same note re-uses its voice, otherwise released first
+    STEAL_LOWEST_VELOCITY = 'velocity'		# Released voices first, then the softest playing note
+    STEAL_POLICIES = [STEAL_OLDEST, STEAL_RELEASED_FIRST, STEAL_RETRIGGER, STEAL_LOWEST_VELOCITY]
+
+    NONE = 0xFF							# No voice / end of a list
+
+    # Voice lists
+    RELEASED = 0						# Released voices in note off order
+    PLAYING  = 1						# Playing voices in note on order
+
+    def __init__(self, voices=16, policy=STEAL_RELEASED_FIRST):
+        # Note map: MIDI note number --> voice playing it (NONE: not playing)
+        self._note_voice = bytearray([Voice_allocator_class.NONE]*128)
+
+        # Voice states
+        self._voice_note = bytearray(voices)
+        self._voice_velocity = bytearray(voices)
+        self._voice_playing = bytearray(voices)
+        self._voice_stamp = [0]*voices		# Note on time stamp (monotonic counter)
+        self._stamp = 0
+
+        # The released and playing lists are linked through the voices.
+        # The head of a list is its oldest voice.
+        self._prev = bytearray([Voice_allocator_class.NONE]*voices)
+        self._next = bytearray([Voice_allocator_class.NONE]*voices)
+        self._head = bytearray([Voice_allocator_class.NONE]*2)
+        self._tail = bytearray([Voice_allocator_class.NONE]*2)
+        for voice in list(range(voices)):
+            self._append(Voice_allocator_class.RELEASED, voice)
+
+        self.stolen = False					# True if allocate() took a playing voice
+        self.set_policy(policy)
+
+    # Change the steal policy
+    def set_policy(self, policy):
+        if policy not in Voice_allocator_class.STEAL_POLICIES:
+            raise ValueError('Unknown steal policy: ' + str(policy))
+
+        self.policy = policy
+        self.retrigger = (policy == Voice_allocator_class.STEAL_RETRIGGER)
+
+    # Append a voice to the tail of a list
+    def _append(self, lst, voice):
+        tail = self._tail[lst]
+        self._prev[voice] = tail
+        self._next[voice] = Voice_allocator_class.NONE
+        if tail == Voice_allocator_class.NONE:
+            self._head[lst] = voice
+        else:
+            self._next[tail] = voice
+
+        self._tail[lst] = voice
+
+    # Remove a voice from a list
+    def _unlink(self, lst, voice):
+        prev = self._prev[voice]
+        nxt = self._next[voice]
+        if prev == Voice_allocator_class.NONE:
+            self._head[lst] = nxt
+        else:
+            self._next[prev] = nxt
+
+        if nxt == Voice_allocator_class.NONE:
+            self._tail[lst] = prev
+        else:
+            self._prev[nxt] = prev
+
+    # Select a voice for a new note
+    def _select(self):
+        released = self._head[Voice_allocator_class.RELEASED]
+        playing  = self._head[Voice_allocator_class.PLAYING]
+
+        # All voices are playing
+        if released == Voice_allocator_class.NONE:
+            # The softest note (the oldest one for the same velocity), up to 16 voices
+            if self.policy == Voice_allocator_class.STEAL_LOWEST_VELOCITY:
+                softest = playing
+                voice = self._next[playing]
+                while voice != Voice_allocator_class.NONE:
+                    if self._voice_velocity[voice] < self._voice_velocity[softest]:
+                        softest = voice
+                    voice = self._next[voice]
+
+                return softest
+
+            return playing
+
+        # The oldest note on, whether it has been released or not.
+        # The released list is in note off order, so it is searched (up to 16 voices).
+        if self.policy == Voice_allocator_class.STEAL_OLDEST:
+            oldest = released
+            voice = self._next[released]
+            while voice != Voice_allocator_class.NONE:
+                if self._voice_stamp[voice] < self._voice_stamp[oldest]:
+                    oldest = voice
+                voice = self._next[voice]
+
+            if playing != Voice_allocator_class.NONE and self._voice_stamp[playing] < self._voice_stamp[oldest]:
+                return playing
+
+            return oldest
+
+        return released
+
+    # Voice playing a note (-1: not playing)
+    def voice_of(self, notenum):
+        voice = self._note_voice[notenum]
+        return -1 if voice == Voice_allocator_class.NONE else voice
+
+    # Allocate a voice to a note.
+    #   self.stolen is True if the voice was playing a note to be turned off.
+    def allocate(self, notenum, velocity):
+        voice = self._note_voice[notenum]
+        if voice == Voice_allocator_class.NONE or not self.retrigger:
+            voice = self._select()
+
+        self.stolen = (self._voice_playing[voice] != 0)
+        if self.stolen:
+            self._note_voice[self._voice_note[voice]] = Voice_allocator_class.NONE
+            self._unlink(Voice_allocator_class.PLAYING, voice)
+        else:
+            self._unlink(Voice_allocator_class.RELEASED, voice)
+
+        self._append(Voice_allocator_class.PLAYING, voice)
+        self._stamp += 1
+        self._voice_stamp[voice] = self._stamp
+        self._voice_note[voice] = notenum
+        self._voice_velocity[voice] = velocity
+        self._voice_playing[voice] = 1
+        self._note_voice[notenum] = voice
+        return voice
+
+    # Release a note, returns its voice (-1: not playing)
+    def release(self, notenum):
+        voice = self._note_voice[notenum]
+        if voice == Voice_allocator_class.NONE:
+            return -1
+
+        self._note_voice[notenum] = Voice_allocator_class.NONE
+        self._voice_playing[voice] = 0
+        self._unlink(Voice_allocator_class.PLAYING, voice)
+        self._append(Voice_allocator_class.RELEASED, voice)
+        return voice
+
+    # Release all the notes
+    def release_all(self):
+        while self._head[Voice_allocator_class.PLAYING] != Voice_allocator_class.NONE:
+            self.release(self._voice_note[self._head[Voice_allocator_class.PLAYING]])
+
+
+###################################
+# CLASS: Sound bank file
+#   All the binary sound patches of a bank in a file (see BANK_* in ymf825_codec):
+#     Header (16 bytes): magic, version, record size (uint16), records (uint16)
+#     Slot table: record index (uint16, BANK_EMPTY: no sound) for each sound number
+#     Records: binary sound patches (see YMF825_class.make_patch()) in the order written
+###################################
+class Sound_bank_class:
+    def __init__(self, bank, record_size):
+        self.bank = bank
+        self.record_size = record_size
+        self._table = bytearray([0xFF] * (ymf825_codec.BANK_SLOTS * 2))
+        self._records = 0
+        self._index = bytearray(2)
+        self.exists = self.load_table()
+
+    # Sound bank file name
+    @staticmethod
+    def file_name(bank):
+        return 'BANK' + str(bank) + '.ymb'
+
+    def path(self):
+        return Sound_library_class.SOUND_DIR + Sound_bank_class.file_name(self.bank)
+
+    # Read the header and the slot table
+    def load_table(self):
+        try:
+            with open(self.path(), 'rb') as f:
+                header = f.read(ymf825_codec.BANK_HEADER_SIZE)
+                if header[0:4] != ymf825_codec.BANK_MAGIC or header[4] != ymf825_codec.BANK_VERSION or struct.unpack_from('<H', header, 6)[0] != self.record_size:
+                    print('UNKNOWN SOUND BANK:', self.path())
+                    return False
+
+                self._records = struct.unpack_from('<H', header, 8)[0]
+                return f.readinto(self._table) == len(self._table)
+
+        except OSError:
+            return False
+
+    # Make an empty sound bank file
+    def create(self):
+        header = bytearray(ymf825_codec.BANK_HEADER_SIZE)
+        header[0:4] = ymf825_codec.BANK_MAGIC
+        header[4] = ymf825_codec.BANK_VERSION
+        struct.pack_into('<H', header, 6, self.record_size)
+        for pos in list(range(len(self._table))):
+            self._table[pos] = 0xFF
+
+        self._records = 0
+        with open(self.path(), 'wb') as f:
+            f.write(header)
+            f.write(self._table)
+
+        self.exists = True
+
+    # Record index of a sound number (-1: no sound)
+    def record_of(self, number):
+        idx = self._table[number * 2] | (self._table[number * 2 + 1] << 8)
+        return -1 if idx == ymf825_codec.BANK_EMPTY else idx
+
+    # Sound numbers in the bank
+    def numbers(self):
+        return [number for number in list(range(ymf825_codec.BANK_SLOTS)) if self.record_of(number) >= 0]
+
+    # Read a sound into buf (record_size bytes)
+    def read(self, number, buf):
+        idx = self.record_of(number)
+        if idx < 0:
+            return False
+
+        try:
+            with open(self.path(), 'rb') as f:
+                f.seek(ymf825_codec.BANK_RECORDS + idx * self.record_size)
+                return f.readinto(buf) == self.record_size
+
+        except OSError:
+            return False
+
+    # Write a sound in buf (record_size bytes), a new sound is appended
+    def write(self, number, buf):
+        if not self.exists:
+            self.create()
+
+        idx = self.record_of(number)
+        with open(self.path(), 'r+b') as f:
+            if idx < 0:
+                idx = self._records
+                self._records += 1
+                self._table[number * 2] = idx & 0xff
+                self._table[number * 2 + 1] = idx >> 8
+
+                # Slot and records in the header
+                f.seek(ymf825_codec.BANK_TABLE + number * 2)
+                f.write(self._table[number * 2:number * 2 + 2])
+                struct.pack_into('<H', self._index, 0, self._records)
+                f.seek(8)
+                f.write(self._index)
+
+            f.seek(ymf825_codec.BANK_RECORDS + idx * self.record_size)
+            f.write(buf)
+
+
+###################################
+# CLASS: Sound library index
+#   Index file lines: bank, number, mtime, size, crc32 and sound name separated by TAB.
+#   The lines appended later override the former ones of the same sound.
+#   A bank having a sound bank file uses it instead of the JSON files,
+#   the line with number -1 is the mtime and size of the sound bank file.
+###################################
+class Sound_library_class:
+    SOUND_DIR = 'SYNTH/SOUND/'
+    INDEX_FILE = 'SYNTH/SOUND/INDEX.TSV'
+    INDEX_SLACK = 32				# Overridden lines allowed in the index file before rewriting it
+
+    def __init__(self):
+        # bank * 1000 + number --> [mtime, size, crc32, sound name]
+        self._entries = {}
+
+        # Lines in the index file
+        self._index_lines = 0
+
+        # bank --> (mtime, size) of the sound bank file
+        self._bank_stats = {}
+
+        # bank --> Sound_bank_class object (only the banks having a sound bank file)
+        self._banks = {}
+        self._record = bytearray(ymf825_codec.PATCH_SIZE)
+
+        # Counted up when the sounds are changed (see Sound_search_class)
+        self.generation = 0
+
+        self.load_index()
+        self.refresh()
+
+    # Sound file name
+    @staticmethod
+    def file_name(bank, number):
+        return 'SNDP' + str(bank) + '{:03d}'.format(number) + '.json'
+
+    # Binary sound patch file name (see YMF825_class.make_patch())
+    @staticmethod
+    def patch_file_name(bank, number):
+        return 'SNDP' + str(bank) + '{:03d}'.format(number) + '.bin'
+
+    # Read the index file
+    def load_index(self):
+        try:
+            with open(Sound_library_class.INDEX_FILE, 'r') as f:
+                for line in f:
+                    cols = line.rstrip('\n').split('\t', 5)
+                    if len(cols) == 6:
+                        self._index_lines += 1
+                        if int(cols[1]) < 0:
+                            self._bank_stats[int(cols[0])] = (int(cols[2]), int(cols[3]))
+                        else:
+                            self._entries[int(cols[0]) * 1000 + int(cols[1])] = [int(cols[2]), int(cols[3]), int(cols[4]), cols[5]]
+
+        except (OSError, ValueError):
+            self._entries = {}
+            self._bank_stats = {}
+            self._index_lines = 0
+
+    # Lines in the index file without the overridden ones
+    def _live_lines(self):
+        return len(self._entries) + len(self._bank_stats)
+
+    # Index line of a sound
+    def _index_line(self, key):
+        entry = self._entries[key]
+        return '{:d}\t{:d}\t{:d}\t{:d}\t{:d}\t{:s}\n'.format(key // 1000, key % 1000, entry[0], entry[1], entry[2], entry[3])
+
+    # Index line of a sound bank file
+    def _bank_line(self, bank):
+        stat = self._bank_stats[bank]
+        return '{:d}\t-1\t{:d}\t{:d}\t0\t\n'.format(bank, stat[0], stat[1])
+
+    # Write the whole index file
+    def save_index(self):
+        try:
+            with open(Sound_library_class.INDEX_FILE, 'w') as f:
+                for bank in sorted(self._bank_stats):
+                    f.write(self._bank_line(bank))
+
+                for key in sorted(self._entries):
+                    f.write(self._index_line(key))
+
+            self._index_lines = self._live_lines()
+
+        except OSError as e:
+            print('INDEX NOT SAVED:', e)
+
+    # Append lines to the index file, rewrite it if it has many overridden lines
+    def _append_index(self, lines):
+        try:
+            with open(Sound_library_class.INDEX_FILE, 'a') as f:
+                for line in lines:
+                    f.write(line)
+
+            self._index_lines += len(lines)
+
+        except OSError as e:
+            print('INDEX NOT SAVED:', e)
+            return
+
+        if self._index_lines > self._live_lines() + Sound_library_class.INDEX_SLACK:
+            self.save_index()
+
+    # Make an index entry from a sound file data
+    @staticmethod
+    def _make_entry(stat, data):
+        sound_name = ''
+        try:
+            for parm in json.loads(data):
+                if parm['target'] == YMF825_class.SAVE and parm['name'] == YMF825_class.PARAMETER['Sound Name']:
+                    sound_name = parm['value']
+                    break
+
+        except (ValueError, KeyError, TypeError):
+            pass
+
+        return [stat[8], stat[6], binascii.crc32(data), sound_name]
+
+    # Update the index for the sound files added, changed or removed.
+    #   Only the files with another mtime or size than the index are read.
+    def refresh(self):
+        stale = False
+        found = {}
+        path_files = os.listdir(Sound_library_class.SOUND_DIR)
+
+        # Sound bank files
+        self._banks = {}
+        for pf in path_files:
+            if pf[-4:] == '.ymb' and pf[0:4] == 'BANK':
+                bank = int(pf[4])
+                sound_bank = Sound_bank_class(bank, ymf825_codec.PATCH_SIZE)
+                if sound_bank.exists:
+                    self._banks[bank] = sound_bank
+                    stat = os.stat(Sound_library_class.SOUND_DIR + pf)
+                    if self._bank_stats.get(bank) != (stat[8], stat[6]):
+                        self._index_bank(sound_bank, stat)
+                        stale = True
+
+                    for number in sound_bank.numbers():
+                        found[bank * 1000 + number] = True
+
+        for bank in list(self._bank_stats):
+            if bank not in self._banks:
+                del self._bank_stats[bank]
+                stale = True
+
+        # JSON sound files of the banks without sound bank file
+        for pf in path_files:
+            if pf[-5:] == '.json' and pf[0:4] == 'SNDP' and int(pf[4]) not in self._banks:
+                key = int(pf[4]) * 1000 + int(pf[5:8])
+                found[key] = True
+                stat = os.stat(Sound_library_class.SOUND_DIR + pf)
+                entry = self._entries.get(key)
+                if entry is None or entry[0] != stat[8] or entry[1] != stat[6]:
+                    with open(Sound_library_class.SOUND_DIR + pf, 'rb') as f:
+                        self._entries[key] = Sound_library_class._make_entry(stat, f.read())
+
+                    stale = True
+
+        for key in list(self._entries):
+            if key not in found:
+                del self._entries[key]
+                stale = True
+
+        if stale:
+            self.generation += 1
+
+        # Rewrite the index file without the overridden lines
+        if stale or self._index_lines != self._live_lines():
+            self.save_index()
+
+    # Index all the sounds in a sound bank file
+    def _index_bank(self, sound_bank, stat):
+        print('INDEX SOUND BANK:', sound_bank.bank)
+        for key in list(self._entries):
+            if key // 1000 == sound_bank.bank:
+                del self._entries[key]
+
+        for number in sound_bank.numbers():
+            if sound_bank.read(number, self._record):
+                self._entries[sound_bank.bank * 1000 + number] = [stat[8], stat[6], binascii.crc32(self._record), ymf825_codec.patch_name(self._record)]
+
+        self._bank_stats[sound_bank.bank] = (stat[8], stat[6])
+
+    # Sound bank file of a bank (None: the bank uses JSON files)
+    def sound_bank(self, bank):
+        return self._banks.get(bank)
+
+    # Update the index for a sound written in a sound bank file
+    #   record:: the binary sound patch written
+    def update_record(self, bank, number, record):
+        key = bank * 1000 + number
+        sound_bank = self._banks.get(bank)
+        if sound_bank is None:
+            return
+
+        stat = os.stat(sound_bank.path())
+        self._entries[key] = [stat[8], stat[6], binascii.crc32(record), ymf825_codec.patch_name(record)]
+        self._bank_stats[bank] = (stat[8], stat[6])
+        self.generation += 1
+        self._append_index([self._index_line(key), self._bank_line(bank)])
+
+    # Update the index for a sound file saved
+    #   data:: the sound file data written (str)
+    def update(self, bank, number, data):
+        key = bank * 1000 + number
+        stat = os.stat(Sound_library_class.SOUND_DIR + Sound_library_class.file_name(bank, number))
+        self._entries[key] = Sound_library_class._make_entry(stat, data.encode())
+        self.generation += 1
+        self._append_index([self._index_line(key)])
+
+    # Sound name of a sound file (None: no file)
+    def name_of(self, bank, number):
+        entry = self._entries.get(bank * 1000 + number)
+        return None if entry is None else entry[3]
+
+    # crc32 of a sound file (None: no file)
+    def crc_of(self, bank, number):
+        entry = self._entries.get(bank * 1000 + number)
+        return None if entry is None else entry[2]
+
+    # Sounds in a bank: [(number, sound name)] in the number order
+    def bank_sounds(self, bank):
+        sounds = []
+        for key in sorted(self._entries):
+            if key // 1000 == bank:
+                sounds.append((key % 1000, self._entries[key][3]))
+
+        return sounds
+
+    # Sounds in all the banks: [(bank * 1000 + number, sound name)] in the bank and number order
+    def sounds(self):
+        return [(key, self._entries[key][3]) for key in sorted(self._entries)]
+
+
+###################################
+# CLASS: Sound name search index
+#   The sound names of all the banks in the library index, case insensitive.
+#   Bigram index: 2 characters in a name --> sounds having them
+###################################
+class Sound_search_class:
+    # Ranks of a match
+    RANK_NAME   = 0						# Whole name
+    RANK_PREFIX = 1						# Beginning of the name
+    RANK_WORD   = 2						# Beginning of a word in the name
+    RANK_PART   = 3						# Anywhere in the name
+
+    def __init__(self, library):
+        self._library = library
+        self._generation = -1
+        self._names = {}					# bank * 1000 + number --> sound name in upper case
+        self._grams = {}					# bigram --> [bank * 1000 + number] in the order
+
+        # The last query and its matches for the next query including it
+        self._last_query = None
+        self._last_matches = []
+
+    # Make the index from the library index
+    def build(self):
+        self._names = {}
+        self._grams = {}
+        for key, sound_name in self._library.sounds():
+            sound_name = sound_name.strip().upper()
+            self._names[key] = sound_name
+            for pos in list(range(len(sound_name) - 1)):
+                gram = sound_name[pos:pos + 2]
+                keys = self._grams.get(gram)
+                if keys is None:
+                    self._grams[gram] = [key]
+                elif keys[-1] != key:
+                    keys.append(key)
+
+        self._generation = self._library.generation
+        self._last_query = None
+        self._last_matches = []
+
+    # Sounds having a text in their names.
+    #   Returns [bank * 1000 + number] in the rank order, then in the bank and number order.
+    def query(self, text):
+        if self._generation != self._library.generation:
+            self.build()
+
+        text = text.strip().upper()
+        if len(text) == 0:
+            return []
+
+        # Candidates: the matches of the last query (a part of this query),
+        # all the sounds for a character, or the sounds in the shortest bigram list.
+        if self._last_query is not None and self._last_query in text:
+            candidates = self._last_matches
+        elif len(text) == 1:
+            candidates = sorted(self._names)
+        else:
+            candidates = None
+            for pos in list(range(len(text) - 1)):
+                keys = self._grams.get(text[pos:pos + 2])
+                if keys is None:
+                    candidates = []
+                    break
+
+                if candidates is None or len(keys) < len(candidates):
+                    candidates = keys
+
+        # Rank the matches
+        matches = []
+        ranked = [[], [], [], []]
+        for key in candidates:
+            sound_name = self._names[key]
+            pos = sound_name.find(text)
+            if pos < 0:
+                continue
+
+            matches.append(key)
+            if sound_name == text:
+                ranked[Sound_search_class.RANK_NAME].append(key)
+            elif pos == 0:
+                ranked[Sound_search_class.RANK_PREFIX].append(key)
+            elif sound_name[pos - 1] == ' ':
+                ranked[Sound_search_class.RANK_WORD].append(key)
+            else:
+                ranked[Sound_search_class.RANK_PART].append(key)
+
+        self._last_query = text
+        self._last_matches = matches
+        return ranked[0] + ranked[1] + ranked[2] + ranked[3]
+
+
+###################################
+# CLASS: A parameter of YMF825_class
+#   Accessed as a dict too (parm['value']) for compatibility.
+###################################
+class YMF825_parameter_class:
+    __slots__ = ('name', 'max', 'val_conv', 'value', 'parm_pos', 'val_mask', 'shift', 'mask')
+
+    def __init__(self, parm):
+        self.name     = parm['name']
+        self.max      = parm['max']
+        self.val_conv = parm['val_conv']
+        self.value    = parm['value']
+        self.parm_pos = parm['parm_pos']
+        self.val_mask = parm['val_mask']
+        self.shift    = parm['shift']
+        self.mask     = parm['mask']
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
 
 ###################################
 # CLASS: YMF825 FM Synthesizer
@@ -507,7 +1243,7 @@ class YMF825_class:
         "Key Sence Enable": "KYSE",	"Key Sence Level": "KSLV",	"Ignore Key Off": "IGOF",
         "Equalizer Type": "TYPE",	"Cutoff Frequency": "FREQ",	"Q Factor": "Qfct",						"Cursor": "<-->",
         "Sound Bank": "BANK",		"Sound Number": "NUM.",		"Sound Name": "NAME",
-        "Save Sound": "SAVE",		"Load Sound": "LOAD"
+        "Save Sound": "SAVE",		"Load Sound": "LOAD",		"Tone Slot": "TONE",					"Multi Timbral": "MULT"
     }
 
     PARM_TEXT_OFF_ON = ['OFF', 'ON ']
@@ -658,16 +1394,47 @@ class YMF825_class:
             {'name': PARAMETER['Sound Number'],                'max': 1000, 'val_conv': '{:12s}',           'value':              0,        'parm_pos': 0, 'val_mask': 0x00, 'shift': 0, 'mask': 0x00},
             {'name': PARAMETER['Sound Name'],                  'max':    8, 'val_conv': '{:s}',             'value': '            ',        'parm_pos': 0, 'val_mask': 0x00, 'shift': 0, 'mask': 0x00},
             {'name': PARAMETER['Cursor'],                      'max':   12, 'val_conv': PARM_TEXT_CURSOR_T, 'value':              0,        'parm_pos': 0, 'val_mask': 0x00, 'shift': 0, 'mask': 0x00},
-            {'name': PARAMETER['Load Sound'],                  'max':    6, 'val_conv': PARM_TEXT_LOAD,     'value':              0,        'parm_pos': 0, 'val_mask': 0x00, 'shift': 0, 'mask': 0x00}
+            {'name': PARAMETER['Load Sound'],                  'max':    6, 'val_conv': PARM_TEXT_LOAD,     'value':              0,        'parm_pos': 0, 'val_mask': 0x00, 'shift': 0, 'mask': 0x00},
+            {'name': PARAMETER['Tone Slot'],                   'max':   16, 'val_conv': '{:3d}',            'value':              0,        'parm_pos': 0, 'val_mask': 0x00, 'shift': 0, 'mask': 0x00},
+            {'name': PARAMETER['Multi Timbral'],               'max':    2, 'val_conv': PARM_TEXT_OFF_ON,   'value':              0,        'parm_pos': 0, 'val_mask': 0x00, 'shift': 0, 'mask': 0x00}
         ]
     }
 
+    # Parameter index: (target, name) --> index in YMF825_PARM[target] (see compile_parameter_schema())
+    PARM_INDEX = None
+
+    # Registers always written (burst ports, sequencer and key on/off)
+    REG_VOLATILE = (0x07, 0x08, 0x0F)
+    REG_SHADOW_SIZE = 0x20 + 16 * 8		# Control registers + voice registers for 16 voices
+
+    # Register writes buffered in a transaction before flushing
+    TXN_MAX_WRITES = 64
+
+    # Tone slots
+    TONE_SLOTS = 16
+    TONE_BYTES = ymf825_codec.TONE_BYTES
+
+    # CEQ blocks (15 bytes for an equalizer) cached
+    CEQ_CACHE_SIZE = 32
+
+    # Binary sound patches (PATCH_SIZE bytes for a sound) cached
+    PATCH_CACHE_SIZE = 8
+
+    # Sounds prefetched after a program change: number +1, -1, .. +PREFETCH_RANGE, -PREFETCH_RANGE
+    PREFETCH_RANGE = 2
+
+    # Time for YMF825 to settle after a tone or equalizer upload (msec)
+    UPLOAD_SETTLE_MS = 200
+
     # Note data HI
     NOTENUM_HI = (0x10,0x10,0x10,0x10,0x10,0x10,0x10,0x10,0x10,0x10,0x10,0x10,0x10,0x10,0x18,0x18,0x18,0x18,0x18,0x20,0x20,0x20,0x20,0x28,0x11,0x11,0x19,0x19,0x19,0x19,0x19,0x21,0x21,0x21,0x21,0x29,0x12,0x12,0x1A,0x1A,0x1A,0x1A,0x1A,0x22,0x22,0x22,0x22,0x2A,0x13,0x13,0x1B,0x1B,0x1B,0x1B,0x1B,0x23,0x23,0x23,0x23,0x2B,0x14,0x14,0x1C,0x1C,0x1C,0x1C,0x1C,0x24,0x24,0x24,0x24,0x2C,0x15,0x15,0x1D,0x1D,0x1D,0x1D,0x1D,0x25,0x25,0x25,0x25,0x2D,0x16,0x16,0x1E,0x1E,0x1E,0x1E,0x1E,0x26,0x26,0x26,0x26,0x2E,0x17,0x17,0x1F,0x1F,0x1F,0x1F,0x1F,0x27,0x27,0x27,0x27,0x2F,0x10,0x10,0x18,0x18,0x18,0x18,0x18,0x20,0x20,0x20,0x20,0x28,0x11,0x11,0x19,0x19,0x19,0x19,0x10,0x1E)
     # Note data LO
     NOTENUM_LO = (0x65,0x65,0x65,0x65,0x65,0x65,0x65,0x65,0x65,0x65,0x65,0x65,0x65,0x7A,0x11,0x29,0x42,0x5D,0x79,0x17,0x37,0x59,0x7D,0x22,0x65,0x7A,0x11,0x29,0x42,0x5D,0x79,0x17,0x37,0x59,0x7D,0x22,0x65,0x7A,0x11,0x29,0x42,0x5D,0x79,0x17,0x37,0x59,0x7D,0x22,0x65,0x7A,0x11,0x29,0x42,0x5D,0x79,0x17,0x37,0x59,0x7D,0x22,0x65,0x7A,0x11,0x29,0x42,0x5D,0x79,0x17,0x37,0x59,0x7D,0x22,0x65,0x7A,0x11,0x29,0x42,0x5D,0x79,0x17,0x37,0x59,0x7D,0x22,0x65,0x7A,0x11,0x29,0x42,0x5D,0x79,0x17,0x37,0x59,0x7D,0x22,0x65,0x7A,0x11,0x29,0x42,0x5D,0x79,0x17,0x37,0x59,0x7D,0x22,0x65,0x7A,0x11,0x29,0x42,0x5D,0x79,0x17,0x37,0x59,0x7D,0x22,0x65,0x7A,0x11,0x29,0x42,0x5D,0x65,0x5D)
 
-    def __init__(self, spi_clock=GP18, spi_mosi=GP19, spi_miso=GP16, spi_cs=GP17, ymf825_reset=GP22):
+    def __init__(self, spi_clock=GP18, spi_mosi=GP19, spi_miso=GP16, spi_cs=GP17, ymf825_reset=GP22, steal_policy=Voice_allocator_class.STEAL_RELEASED_FIRST, edit_upload_interval=0.1, prefetch_interval=0.05):
+        # Parameters schema
+        YMF825_class.compile_parameter_schema()
+
         # YMF825 reset pin
         self._PIN_RESET = digitalio.DigitalInOut(ymf825_reset)
         self._PIN_RESET.direction = digitalio.Direction.OUTPUT
@@ -676,6 +1443,27 @@ class YMF825_class:
         self._PIN_SPI_CS = digitalio.DigitalInOut(spi_cs)
         self._PIN_SPI_CS.direction = digitalio.Direction.OUTPUT
         
+        # Register shadow: the last value written to each control register (0x00..0x1F).
+        # The voice registers (0x0C..0x13) have a value per voice selected with 0x0B.
+        self._reg_shadow = bytearray(YMF825_class.REG_SHADOW_SIZE)
+        self._reg_valid = bytearray(YMF825_class.REG_SHADOW_SIZE)
+        self.spi_writes = 0									# Register writes sent
+        self.spi_skips = 0									# Register writes skipped (no change)
+
+        # Register write transaction: (address, data) pairs sent by txn_flush()
+        self._spi_byte = bytearray(2)
+        self._txn_buf = bytearray(2 * YMF825_class.TXN_MAX_WRITES)
+        self._txn_len = 0
+        self._txn_active = False
+
+        # Deadline of the last tone or equalizer upload to settle (see settle())
+        self._settle_deadline = ticks_ms()
+
+        # Edits waiting for upload (see send_edits())
+        self.edit_upload_interval = edit_upload_interval		# Upload interval (sec)
+        self._tone_edited = False
+        self._equalizers_edited = 0							# Bit per equalizer
+
         # YMF825 SPI
         self._spi_locked = False
         self._spi = busio.SPI(spi_clock, MOSI=spi_mosi, MISO=spi_miso)			# board.SPI does NOT work for PICO, use busio.SPI
@@ -685,17 +1473,75 @@ class YMF825_class:
         self._spi.configure(baudrate = 10000000, polarity = 0, phase = 0, bits = 8) 
         self.spi_unlock()
 
+        # Tone slots of YMF825 (multi-timbral), all the slots are sent in one burst
+        self._tone_slots = [bytearray(YMF825_class.TONE_BYTES) for slot in list(range(YMF825_class.TONE_SLOTS))]
+        self._tone_slots_dirty = 0							# Bit per slot changed since the last upload
+        self._channel_tone = bytearray(16)					# MIDI channel --> tone slot
+        self._voice_tone = bytearray(16)					# Voice --> tone slot of the last note on
+        self.edit_tone = 0									# Tone slot to edit with the editor pages
+
+        # Tone image of the editor parameters, patched by each edit (see compile_tone_schema())
+        self._tone_image = bytearray(YMF825_class.TONE_BYTES)
+        self._tone_image_dirty = bytearray([1]*YMF825_class.TONE_BYTES)	# Bytes changed since the last upload
+        self._tone_image_changes = YMF825_class.TONE_BYTES		# Number of the dirty bytes
+        self._tone_image_slot = -1							# Tone slot uploaded to
+        self.compile_tone_schema()
+        self.compile_tone()
+
         # Setup YMF825
         self.setup()
 
         # Voices
-        self._voice_note = [None]*16
-        self._voice_duration = [-1]*16
+        self._voice_allocator = Voice_allocator_class(16, steal_policy)
         
+        # Raw MIDI event handlers indexed by the status nibble (see midi_in())
+        self.midi_event_handlers = [None]*16
+        self.midi_event_handlers[0x8] = self.midi_note_off
+        self.midi_event_handlers[0x9] = self.midi_note_on
+        self.midi_event_handlers[0xB] = self.midi_control_change
+        self.midi_event_handlers[0xC] = self.midi_program_change
+
+        # Program change: bank select (CC0, CC32) and the sound requested (bank * 1000 + number, -1: none)
+        self._bank_select_msb = 0
+        self._bank_select_lsb = 0
+        self._program_request = -1
+        self._program_changed = False
+
+        # Sound requested by a program change for each tone slot but the one to edit (-1: none)
+        self._tone_requests = [-1] * YMF825_class.TONE_SLOTS
+
+        # Prefetch around the sound of the last program change (-1: none)
+        self.prefetch_interval = prefetch_interval			# Load or prefetch interval (sec)
+        self._prefetch_key = -1
+        self._prefetch_step = 0
+        self._prefetch_patch = bytearray(ymf825_codec.PATCH_SIZE)	# Sound read without changing the parameters
+
         # One equalizer parameters buffer (address + 15bytes)
         self.equalizer_ceq = bytearray(16)
+
+        # CEQ block cache: (filter type, cutoff, Q) --> 15 bytes, LRU order from the oldest
+        self._ceq_cache = {}
+        self._ceq_cache_order = []
+        self.ceq_cache_hits = 0
+        self.ceq_cache_misses = 0
         
+        # Binary sound patch buffer
+        self._patch = bytearray(ymf825_codec.PATCH_SIZE)
+
+        # Default sound for the parameters missing in a JSON sound file
+        self._default_patch = bytearray(ymf825_codec.PATCH_SIZE)
+        self.make_patch(self._default_patch, 0)
+
+        # Sound patch cache: bank * 1000 + number --> [crc32 in the library index, binary sound patch],
+        # LRU order from the oldest
+        self._patch_cache = {}
+        self._patch_cache_order = []
+        self.patch_cache_hits = 0
+        self.patch_cache_misses = 0
+
         # Sound parameter files matched the search name in the current bank
+        self.sound_library = Sound_library_class()
+        self.sound_search = Sound_search_class(self.sound_library)
         self.sound_files = []
         self.find_sound_files()
 
@@ -720,6 +1566,7 @@ class YMF825_class:
     # Reset YMF825
     def reset(self):
         print('Reseting YMF825.')
+        self.invalidate_shadow()
         self._PIN_RESET.value = True
         sleep(1.0)
         self._PIN_RESET.value = False
@@ -732,75 +1579,169 @@ class YMF825_class:
     #   addr:: SPI register address
     #   data_array: byte data in array
     def spi_write(self, addr, data_array):
+        # Keep the order with the register writes in a transaction
+        self.txn_flush()
+
         self.spi_lock()
         data_array[0] = addr
         self.spi_chip_select(True)
-        self._spi.write(bytearray(data_array))
+        self._spi.write(data_array)
         self.spi_chip_select(False)
         self.spi_unlock()
+        self.spi_writes += 1
 
     # Write one byte data to SPI for YMF825
     #   addr:: SPI register address
     #   byte_data: one byte data
+    #   In a transaction, the data is appended to the transaction buffer.
     def spi_write_byte(self, addr, byte_data):
-        self.spi_lock() 
-        data_array = bytearray([addr, byte_data])
-        self.spi_chip_select(True)
-        self._spi.write(data_array)
-        self.spi_chip_select(False)
+        if self._txn_active:
+            if self._txn_len == len(self._txn_buf):
+                self.txn_flush()
+
+            self._txn_buf[self._txn_len] = addr
+            self._txn_buf[self._txn_len + 1] = byte_data
+            self._txn_len += 2
+
+        else:
+            self.spi_lock() 
+            data_array = self._spi_byte
+            data_array[0] = addr
+            data_array[1] = byte_data
+            self.spi_chip_select(True)
+            self._spi.write(data_array)
+            self.spi_chip_select(False)
+            self.spi_unlock()
+
+        self.spi_writes += 1
+        idx = self._shadow_index(addr)
+        if idx >= 0:
+            self._reg_shadow[idx] = byte_data
+            self._reg_valid[idx] = 1
+
+    # Start a register write transaction.
+    #   The register writes are buffered until txn_end() (or a burst write).
+    def txn_begin(self):
+        self._txn_active = True
+
+    # Send the register writes buffered with one bus lock.
+    #   Each write still has its own chip select as YMF825 requires.
+    def txn_flush(self):
+        if self._txn_len == 0:
+            return
+
+        self.spi_lock()
+        buf = self._txn_buf
+        for pos in range(0, self._txn_len, 2):
+            self.spi_chip_select(True)
+            self._spi.write(buf, start=pos, end=pos + 2)
+            self.spi_chip_select(False)
+
         self.spi_unlock()
+        self._txn_len = 0
+
+    # End a register write transaction and send it
+    def txn_end(self):
+        self.txn_flush()
+        self._txn_active = False
+
+    # Shadow index of a register (-1: not cached)
+    def _shadow_index(self, addr):
+        if addr >= 0x20 or addr in YMF825_class.REG_VOLATILE:
+            return -1
+
+        # Voice registers for the voice selected
+        if addr >= 0x0C and addr <= 0x13:
+            if not self._reg_valid[0x0B]:
+                return -1
+
+            return 0x20 + (self._reg_shadow[0x0B] & 0x0f) * 8 + addr - 0x0C
+
+        return addr
+
+    # Forget the register values (after reset)
+    def invalidate_shadow(self):
+        for idx in list(range(YMF825_class.REG_SHADOW_SIZE)):
+            self._reg_valid[idx] = 0
+
+    # Write one byte data to a register unless it already has the value
+    #   addr:: SPI register address
+    #   byte_data: one byte data
+    def spi_write_reg(self, addr, byte_data):
+        idx = self._shadow_index(addr)
+        if idx >= 0 and self._reg_valid[idx] and self._reg_shadow[idx] == byte_data:
+            self.spi_skips += 1
+            return
+
+        self.spi_write_byte(addr, byte_data)
+
+    # Register write counters: (written, skipped)
+    def register_write_stats(self):
+        return (self.spi_writes, self.spi_skips)
+
+    # Replace the parameter dicts with YMF825_parameter_class objects and index them
+    @staticmethod
+    def compile_parameter_schema():
+        if YMF825_class.PARM_INDEX is not None:
+            return
+
+        index = {}
+        for target in YMF825_class.YMF825_PARM:
+            params = YMF825_class.YMF825_PARM[target]
+            for idx in list(range(len(params))):
+                params[idx] = YMF825_parameter_class(params[idx])
+                key = (target, params[idx].name)
+                if key not in index:
+                    index[key] = idx
+
+        YMF825_class.PARM_INDEX = index
 
     # Get a parameter data with target and parameter name
     def get_value(self, target, parameter):
-        if target in YMF825_class.YMF825_PARM:
-            for parm in YMF825_class.YMF825_PARM[target]:
-                if parm['name'] == parameter:
-                    return parm
+        idx = YMF825_class.PARM_INDEX.get((target, parameter))
+        if idx is None:
+            return None
         
-        return None
+        return YMF825_class.YMF825_PARM[target][idx]
 
     # Get a parameter value text to display
     def get_value_to_display(self, target, parameter, operator=0, as_wave_name=False):
-        var = None
+        val = None
         frm = None
         if target == YMF825_class.GENERAL:
-            for parm in YMF825_class.YMF825_PARM[target]:
-                if parm['name'] == parameter:
-                    val = parm['value']
-                    frm = parm['val_conv']
-                    break
+            parm = self.get_value(target, parameter)
+            if parm is not None:
+                val = parm['value']
+                frm = parm['val_conv']
             
         elif target == YMF825_class.OPERATORS:
-            for parm in YMF825_class.YMF825_PARM[target]:
-                if parm['name'] == parameter:
-                    val = parm['value'][operator]
-                    frm = parm['val_conv']
-                    break
+            parm = self.get_value(target, parameter)
+            if parm is not None:
+                val = parm['value'][operator]
+                frm = parm['val_conv']
             
         elif target == YMF825_class.EQUALIZERS:
-            for parm in YMF825_class.YMF825_PARM[target]:
-                if parm['name'] == parameter:
-                    val = parm['value'][operator]
-                    frm = parm['val_conv']
-                    break
+            parm = self.get_value(target, parameter)
+            if parm is not None:
+                val = parm['value'][operator]
+                frm = parm['val_conv']
 
         elif target == YMF825_class.SAVE or target == YMF825_class.LOAD:
-            for parm in YMF825_class.YMF825_PARM[target]:
-                if parm['name'] == parameter:
-                    val = parm['value']
-                    frm = parm['val_conv']
+            parm = self.get_value(target, parameter)
+            if parm is not None:
+                val = parm['value']
+                frm = parm['val_conv']
 
-                    # Save file number with its sound name
-                    if target == YMF825_class.SAVE and parameter == YMF825_class.PARAMETER['Sound Number']:
-                        sound_name = self.get_sound_name_of_file(self.get_value(YMF825_class.SAVE, YMF825_class.PARAMETER['Sound Bank'])['value'], val)
-                        return frm.format(val, sound_name)
+                # Save file number with its sound name
+                if target == YMF825_class.SAVE and parameter == YMF825_class.PARAMETER['Sound Number']:
+                    sound_name = self.get_sound_name_of_file(self.get_value(YMF825_class.SAVE, YMF825_class.PARAMETER['Sound Bank'])['value'], val)
+                    return frm.format(val, sound_name)
 
-                    # Load file number
-                    if target == YMF825_class.LOAD and parameter == YMF825_class.PARAMETER['Sound Number']:
-                        print('LOAD NUM.:', val, self.sound_files[val])
-                        val = self.sound_files[val]
-                        
-                    break
+                # Load file number with its sound name
+                if target == YMF825_class.LOAD and parameter == YMF825_class.PARAMETER['Sound Number']:
+                    sound_name = self.sound_library.name_of(self.get_value(YMF825_class.LOAD, YMF825_class.PARAMETER['Sound Bank'])['value'], val)
+                    val = '{:03d}:'.format(val) + ('' if sound_name is None else sound_name)
+                    print('LOAD NUM.:', val)
 
         print('DISP:', target, parameter, val, frm)
         if val is not None:
@@ -835,100 +1776,105 @@ class YMF825_class:
     def increment_parameter_value(self, inc, target, parameter, operator=0):
 #        print('INC_PARM:', inc, target, parameter, operator)
         if   target == YMF825_class.GENERAL:
-            for parm in YMF825_class.YMF825_PARM[target]:
-                if parm['name'] == parameter:
-                    val = (parm['value'] + inc) % parm['max']
-                    parm['value'] = val
+            parm = self.get_value(target, parameter)
+            if parm is not None:
+                val = (parm['value'] + inc) % parm['max']
+                parm['value'] = val
+                self.patch_tone(target, parameter)
             
         elif target == YMF825_class.OPERATORS:
-            for parm in YMF825_class.YMF825_PARM[target]:
-                if parm['name'] == parameter:
-                    val = (parm['value'][operator] + inc) % parm['max']                        
-                    parm['value'][operator] = val
+            parm = self.get_value(target, parameter)
+            if parm is not None:
+                val = (parm['value'][operator] + inc) % parm['max']                        
+                parm['value'][operator] = val
+                self.patch_tone(target, parameter, operator)
             
         elif target == YMF825_class.EQUALIZERS:
-            for parm in YMF825_class.YMF825_PARM[target]:
-                if parm['name'] == parameter:
+            parm = self.get_value(target, parameter)
+            if parm is not None:
                     
-                    # Floating point parameters
-                    if   parameter == YMF825_class.PARAMETER['Cutoff Frequency'] or parameter == YMF825_class.PARAMETER['Q Factor']:
-                        digit = self.get_value(target, YMF825_class.PARAMETER['Cursor'])['value'][operator]
-                        if digit <= 1:
-                            val = parm['value'][operator] + inc * 10 ** (1 - digit)
-                        else:
-                            val = parm['value'][operator] + inc / 10 ** (digit - 1)
+                # Floating point parameters
+                if   parameter == YMF825_class.PARAMETER['Cutoff Frequency'] or parameter == YMF825_class.PARAMETER['Q Factor']:
+                    digit = self.get_value(target, YMF825_class.PARAMETER['Cursor'])['value'][operator]
+                    if digit <= 1:
+                        val = parm['value'][operator] + inc * 10 ** (1 - digit)
+                    else:
+                        val = parm['value'][operator] + inc / 10 ** (digit - 1)
 
-                        if val < 0:
-                            val = parm['max']
-                        elif val > parm['max']:
-                            val = 0
+                    if val < 0:
+                        val = parm['max']
+                    elif val > parm['max']:
+                        val = 0
                         
-                    # Integer parameters
-                    else:
-                        val = (parm['value'][operator] + inc) % parm['max']
+                # Integer parameters
+                else:
+                    val = (parm['value'][operator] + inc) % parm['max']
                         
-                    parm['value'][operator] = val
+                parm['value'][operator] = val
                     
         elif target == YMF825_class.SAVE or target == YMF825_class.LOAD:
-            for parm in YMF825_class.YMF825_PARM[target]:
-                if parm['name'] == parameter:
-                    # Character data inc/dec
-                    if parameter == YMF825_class.PARAMETER['Sound Name']:
-                        # Character position in the string
-                        pos = self.get_value(target, YMF825_class.PARAMETER['Cursor'])['value']
-                        val = parm['value'][pos]
+            parm = self.get_value(target, parameter)
+            if parm is not None:
+                # Character data inc/dec
+                if parameter == YMF825_class.PARAMETER['Sound Name']:
+                    # Character position in the string
+                    pos = self.get_value(target, YMF825_class.PARAMETER['Cursor'])['value']
+                    val = parm['value'][pos]
                         
-                        if   inc > 0:
-                            if val == '9':
-                                val = ' '
-                            elif val == ' ':
-                                val = 'A'
-                            elif val == 'Z':
-                                val = 'a'
-                            elif val == 'z':
-                                val = '0'
-                            else:
-                                val = chr(ord(val) + 1)
+                    if   inc > 0:
+                        if val == '9':
+                            val = ' '
+                        elif val == ' ':
+                            val = 'A'
+                        elif val == 'Z':
+                            val = 'a'
+                        elif val == 'z':
+                            val = '0'
+                        else:
+                            val = chr(ord(val) + 1)
                             
-                        elif inc < 0:
-                            if val == '0':
-                                val = 'z'
-                            elif val == 'a':
-                                val = 'Z'
-                            elif val == 'A':
-                                val = ' '
-                            elif val == ' ':
-                                val = '9'
-                            else:
-                                val = chr(ord(val) - 1)
+                    elif inc < 0:
+                        if val == '0':
+                            val = 'z'
+                        elif val == 'a':
+                            val = 'Z'
+                        elif val == 'A':
+                            val = ' '
+                        elif val == ' ':
+                            val = '9'
+                        else:
+                            val = chr(ord(val) - 1)
                         
-                        val = parm['value'][:pos] + val + parm['value'][pos+1:]
-
-                    # Find a next valid sound file in LOAD
-                    elif target == YMF825_class.LOAD and parameter == YMF825_class.PARAMETER['Sound Number']:
-                        start = parm['value']
-                        val = (start + inc) % parm['max']
-                        skip = 0
-                        while len(self.sound_files[val]) <= 4:
-                            skip = skip + 1
-                            val = (val + inc) % parm['max']                                
-                            if val == start:
-                                break
-
-                    # Increment each digit in SAVE
-                    elif target == YMF825_class.SAVE and parameter == YMF825_class.PARAMETER['Sound Number']:
-                        # Digit position in the NUM.
-                        pos = self.get_value(target, YMF825_class.PARAMETER['Cursor'])['value']
-                        if pos >= 3:
-                            pos = 2
+                    val = parm['value'][:pos] + val + parm['value'][pos+1:]
+
+                # Next sound file found in LOAD (may be in another bank)
+                elif target == YMF825_class.LOAD and parameter == YMF825_class.PARAMETER['Sound Number']:
+                    val = parm['value']
+                    if len(self.sound_files) > 0:
+                        bank_parm = self.get_value(target, YMF825_class.PARAMETER['Sound Bank'])
+                        key = bank_parm['value'] * 1000 + val
+                        if key in self.sound_files:
+                            idx = (self.sound_files.index(key) + inc) % len(self.sound_files)
+                        else:
+                            idx = 0 if inc > 0 else len(self.sound_files) - 1
+
+                        bank_parm['value'] = self.sound_files[idx] // 1000
+                        val = self.sound_files[idx] % 1000
+
+                # Increment each digit in SAVE
+                elif target == YMF825_class.SAVE and parameter == YMF825_class.PARAMETER['Sound Number']:
+                    # Digit position in the NUM.
+                    pos = self.get_value(target, YMF825_class.PARAMETER['Cursor'])['value']
+                    if pos >= 3:
+                        pos = 2
                             
-                        val = (parm['value'] + inc * 10 ** (2 - pos)) % parm['max']
+                    val = (parm['value'] + inc * 10 ** (2 - pos)) % parm['max']
 
-                    # Default value inc/dec
-                    else:
-                        val = (parm['value'] + inc) % parm['max']
+                # Default value inc/dec
+                else:
+                    val = (parm['value'] + inc) % parm['max']
                         
-                    parm['value'] = val
+                parm['value'] = val
             
     def reverse_parameters(self, voice_params):
         params = self.YMF825_PARM[YMF825_class.GENERAL]
@@ -958,13 +1904,6 @@ class YMF825_class:
 
     # Save parameter file
     def save_parameter_file(self):
-        # Save keys
-        file_data = []
-        for target in [YMF825_class.GENERAL, YMF825_class.OPERATORS, YMF825_class.EQUALIZERS, YMF825_class.SAVE]:
-            for parm in YMF825_class.YMF825_PARM[target]:
-                print('save:', target, parm['name'], parm['value'])
-                file_data.append({'target': target, 'name': parm['name'], 'value': parm['value']})
-
         parm = self.get_value(YMF825_class.SAVE, YMF825_class.PARAMETER['Sound Bank'])
         if parm is None:
             return
@@ -976,14 +1915,35 @@ class YMF825_class:
             return
         
         number = parm['value']
+
+        # Write in the sound bank file
+        self.make_patch(self._patch, 0)
+        sound_bank = self.sound_library.sound_bank(bank)
+        if sound_bank is not None:
+            print('SAVE TO:', sound_bank.path(), number)
+            sound_bank.write(number, self._patch)
+            self.sound_library.update_record(bank, number, self._patch)
+            self.cache_patch(bank, number)
+            return
+
+        # Write the JSON sound file and the binary sound patch file made from it
+        file_data = ymf825_codec.patch_to_json(self._patch, bank, number)
         print('SAVED:', file_data, str(bank), '{:03d}'.format(number))
-        print('SAVE TO:', 'SYNTH/SOUND/SNDP' + str(bank) + '{:03d}'.format(number) + '.json')
-        with open('SYNTH/SOUND/SNDP' + str(bank) + '{:03d}'.format(number) + '.json', 'w') as f:
+        print('SAVE TO:', Sound_library_class.SOUND_DIR + Sound_library_class.file_name(bank, number))
+        data = json.dumps(file_data)
+        with open(Sound_library_class.SOUND_DIR + Sound_library_class.file_name(bank, number), 'w') as f:
             print('JSON.DUMP')
-            json.dump(file_data, f)
+            f.write(data)
             f.close()
 
-    # Load parameter file
+        self.sound_library.update(bank, number, data)
+        struct.pack_into('<I', self._patch, ymf825_codec.PATCH_JSON_CRC, self.sound_library.crc_of(bank, number))
+        self.write_patch_file(bank, number, self._patch)
+        self.cache_patch(bank, number)
+
+    # Load parameter file.
+    #   The binary sound patch is used if it has been made from the current JSON file,
+    #   otherwise the JSON file is loaded and the binary sound patch is made.
     def load_parameter_file(self):
         parm = self.get_value(YMF825_class.LOAD, YMF825_class.PARAMETER['Sound Bank'])
         if parm is None:
@@ -997,94 +1957,240 @@ class YMF825_class:
         
         number = parm['value']
         print('LOAD:', str(bank), '{:03d}'.format(number))
-        print('LOAD FROM:', 'SYNTH/SOUND/SNDP' + str(bank) + '{:03d}'.format(number) + '.json')
-        
-        success = True
+
+        # Recently loaded sound
+        if self.recall_cached_patch(bank, number):
+            print('PATCH CACHE:', self.patch_cache_stats())
+            return True
+
+        success = self.load_sound(bank, number)
+        if success:
+            self.cache_patch(bank, number)
+
+        print('PATCH CACHE:', self.patch_cache_stats())
+        return success
+
+    # Load a sound in the sound bank file or the sound files to the parameters
+    def load_sound(self, bank, number):
+        return self.read_sound(bank, number, self._patch) and self.apply_patch(self._patch)
+
+    # Read a sound in the sound bank file or the sound files into buf as a compiled binary sound patch.
+    #   The current parameters are not changed.
+    def read_sound(self, bank, number, buf):
+        # Read from the sound bank file
+        sound_bank = self.sound_library.sound_bank(bank)
+        if sound_bank is not None:
+            if not sound_bank.read(number, buf) or not ymf825_codec.is_patch(buf):
+                return False
+
+            # Compiled patch for the next time
+            if not ymf825_codec.is_compiled(buf):
+                self.compile_patch(buf)
+                sound_bank.write(number, buf)
+                self.sound_library.update_record(bank, number, buf)
+
+            return True
+
+        json_crc = self.sound_library.crc_of(bank, number)
+        if json_crc is not None and self.read_patch_file(bank, number, buf):
+            if struct.unpack_from('<I', buf, ymf825_codec.PATCH_JSON_CRC)[0] == json_crc and ymf825_codec.is_patch(buf) and ymf825_codec.is_compiled(buf):
+                return True
+
+        if not self.read_json_file(bank, number, buf):
+            return False
+
+        # Compiled patch for the next time
+        self.compile_patch(buf)
+        if json_crc is not None:
+            struct.pack_into('<I', buf, ymf825_codec.PATCH_JSON_CRC, json_crc)
+            self.write_patch_file(bank, number, buf)
+
+        return True
+
+    # Read a JSON sound file into buf as a binary sound patch (not compiled).
+    #   The parameters missing in the file are the default sound ones.
+    def read_json_file(self, bank, number, buf):
+        print('LOAD FROM:', Sound_library_class.SOUND_DIR + Sound_library_class.file_name(bank, number))
         try:
-            with open('SYNTH/SOUND/SNDP' + str(bank) + '{:03d}'.format(number) + '.json', 'r') as f:
+            with open(Sound_library_class.SOUND_DIR + Sound_library_class.file_name(bank, number), 'r') as f:
                 file_data = json.load(f)
                 print('LOADED:', file_data)
                 f.close()
-                
-            for parm in file_data:
-                target = parm['target']
-                name = parm['name']
-                value = parm['value']
-                parameter = self.get_value(target, name)
-                parameter['value'] = 0 if target == YMF825_class.SAVE and name == YMF825_class.SAVE else value
-                
+
+            ymf825_codec.json_to_patch(file_data, buf, self._default_patch)
+
         except:
-            success = False
-        
-        return success
+            return False
+
+        return True
+
+    # Make a binary sound patch of the current parameters in buf (PATCH_SIZE bytes)
+    #   json_crc:: crc32 of the JSON sound file of the same sound
+    def make_patch(self, buf, json_crc):
+        equalizer = [self.get_value(YMF825_class.EQUALIZERS, name) for name in ymf825_codec.EQUALIZER_NAMES]
+        ymf825_codec.clear_patch(buf)
+        ymf825_codec.set_patch_values(buf,
+            self.get_value(YMF825_class.SAVE, YMF825_class.PARAMETER['Sound Name'])['value'],
+            [self.get_value(YMF825_class.GENERAL, name).value for name in ymf825_codec.GENERAL_NAMES],
+            [self.get_value(YMF825_class.OPERATORS, name).value for name in ymf825_codec.OPERATOR_NAMES],
+            [parm.value for parm in equalizer])
+
+        # Tone image and the CEQ blocks
+        buf[ymf825_codec.PATCH_FLAGS] = ymf825_codec.PATCH_COMPILED
+        buf[ymf825_codec.PATCH_TONE:ymf825_codec.PATCH_TONE + YMF825_class.TONE_BYTES] = self._tone_image
+        for eqno in list(range(3)):
+            self.make_ceq_block(equalizer[0].value[eqno], equalizer[1].value[eqno], equalizer[2].value[eqno])
+            pos = ymf825_codec.PATCH_CEQ + eqno * 15
+            buf[pos:pos + 15] = self.equalizer_ceq[1:16]
+
+        struct.pack_into('<I', buf, ymf825_codec.PATCH_JSON_CRC, json_crc)
+
+    # Make the tone image and the CEQ blocks of a binary sound patch from its parameter values.
+    #   The current parameters are not changed.
+    def compile_patch(self, buf):
+        for byte_order in list(range(YMF825_class.TONE_BYTES)):
+            data = 0
+            for param, opr, pos in self._tone_writers[byte_order]:
+                data = (data & param.mask) | ((buf[pos] & param.val_mask) << param.shift)
+
+            buf[ymf825_codec.PATCH_TONE + byte_order] = data
+
+        values = ymf825_codec.patch_equalizers(buf)
+        for eqno in list(range(3)):
+            self.make_ceq_block(values[0][eqno], values[1][eqno], values[2][eqno])
+            pos = ymf825_codec.PATCH_CEQ + eqno * 15
+            buf[pos:pos + 15] = self.equalizer_ceq[1:16]
+
+        buf[ymf825_codec.PATCH_FLAGS] |= ymf825_codec.PATCH_COMPILED
+
+    # Set a binary sound patch to the parameters.
+    #   The tone image and the CEQ blocks are used as they are (no EQ calculation).
+    #   A patch without them (made by tools/sound_bank.py) is compiled here.
+    #   Returns False if buf is not a sound patch of this version.
+    def apply_patch(self, buf):
+        if not ymf825_codec.is_patch(buf):
+            return False
+
+        if not ymf825_codec.is_compiled(buf):
+            self.compile_patch(buf)
+
+        # Sound name
+        self.get_value(YMF825_class.SAVE, YMF825_class.PARAMETER['Sound Name'])['value'] = ymf825_codec.patch_name(buf)
+
+        # Parameter values
+        names = ymf825_codec.GENERAL_NAMES
+        for idx in list(range(len(names))):
+            self.get_value(YMF825_class.GENERAL, names[idx]).value = buf[ymf825_codec.PATCH_GENERAL + idx]
+
+        names = ymf825_codec.OPERATOR_NAMES
+        for idx in list(range(len(names))):
+            value = self.get_value(YMF825_class.OPERATORS, names[idx]).value
+            for opr in list(range(4)):
+                value[opr] = buf[ymf825_codec.PATCH_OPERATORS + idx * 4 + opr]
+
+        # Tone image
+        for pos in list(range(YMF825_class.TONE_BYTES)):
+            self._set_tone_byte(pos, buf[ymf825_codec.PATCH_TONE + pos])
+
+        # Equalizers, the CEQ blocks are cached for send_equalizer_parameters()
+        equalizer = [self.get_value(YMF825_class.EQUALIZERS, name) for name in ymf825_codec.EQUALIZER_NAMES]
+        values = ymf825_codec.patch_equalizers(buf)
+        for eqno in list(range(3)):
+            for idx in list(range(len(equalizer))):
+                equalizer[idx].value[eqno] = values[idx][eqno]
+
+            pos = ymf825_codec.PATCH_CEQ + eqno * 15
+            self.cache_ceq_block(equalizer[0].value[eqno], equalizer[1].value[eqno], equalizer[2].value[eqno], bytes(buf[pos:pos + 15]))
+
+        return True
+
+    # Read a binary sound patch file into buf
+    def read_patch_file(self, bank, number, buf):
+        try:
+            with open(Sound_library_class.SOUND_DIR + Sound_library_class.patch_file_name(bank, number), 'rb') as f:
+                return f.readinto(buf) == ymf825_codec.PATCH_SIZE
 
-    # Load parameter file
-    def get_sound_name_of_file(self, bank, number):
-        sound_name = '<NEW FILE>'
+        except OSError:
+            return False
+
+    # Write a binary sound patch in buf to the binary sound patch file
+    def write_patch_file(self, bank, number, buf):
         try:
-            with open('SYNTH/SOUND/SNDP' + str(bank) + '{:03d}'.format(number) + '.json', 'r') as f:
-                file_data = json.load(f)
-                f.close()
+            with open(Sound_library_class.SOUND_DIR + Sound_library_class.patch_file_name(bank, number), 'wb') as f:
+                f.write(buf)
 
-                if file_data is not None:
-                    for parm in file_data:
-                        if parm['target'] == YMF825_class.SAVE and parm['name'] == YMF825_class.PARAMETER['Sound Name']:
-                            sound_name = parm['value']
-                            break
-                
-        except:
-            pass
+        except OSError as e:
+            print('PATCH NOT SAVED:', e)
+
+    # Load parameter file
+    def get_sound_name_of_file(self, bank, number):
+        sound_name = self.sound_library.name_of(bank, number)
+        if sound_name is None:
+            sound_name = '<NEW FILE>'
         
         return '{:12s}'.format(sound_name)
 
-    # Find sound files in the current bank and search name
-    def find_sound_files(self):
-        bank = self.get_value(YMF825_class.LOAD, YMF825_class.PARAMETER['Sound Bank'])['value']
+    # Find sound files to load: all the sounds in the LOAD bank without search name,
+    # otherwise the sounds matched the search name in all the banks (the best match first).
+    #   self.sound_files:: [bank * 1000 + number]
+    #   bank_first:: True keeps the sound selected or selects the best match in the LOAD bank,
+    #                False selects the best match.
+    def find_sound_files(self, bank_first=False):
+        bank_parm = self.get_value(YMF825_class.LOAD, YMF825_class.PARAMETER['Sound Bank'])
         name = self.get_value(YMF825_class.LOAD, YMF825_class.PARAMETER['Sound Name'])['value']
         name = name.strip()
-#        print('SEARCH:', bank, name)
-        
-        # List all file numbers
-        self.sound_files = []
-        for filenum in list(range(1000)):
-            self.sound_files.append('{:03d}:'.format(filenum))
+#        print('SEARCH:', bank_parm['value'], name)
 
-        # Search files
-        path_files = os.listdir('SYNTH/SOUND/')
-#        print('FILES:', path_files)
-        for pf in path_files:
-#            print('FILE=', pf)
-            if pf[-5:] == '.json':
-                if pf[0:4] == 'SNDP':
-                    bk = int(pf[4])
-                    if bk == bank:
-                        filenum = int(pf[5:8])
-                        with open('SYNTH/SOUND/' + pf, 'r') as f:
-                            file_data = json.load(f)
-                            for parm in file_data:
-                                if parm['target'] == YMF825_class.SAVE and parm['name'] == YMF825_class.PARAMETER['Sound Name']:
-                                    sound_name = parm['value']
-#                                    print('SOUND NAME:', filenum, sound_name, name, sound_name.find(name))
-                                    if len(name) <= 3 or sound_name.find(name) >= 0:
-                                        self.sound_files[filenum] = self.sound_files[filenum] + sound_name
-                                        
-                            f.close()
+        if len(name) == 0:
+            self.sound_files = [bank_parm['value'] * 1000 + filenum for filenum, sound_name in self.sound_library.bank_sounds(bank_parm['value'])]
+        else:
+            self.sound_files = self.sound_search.query(name)
 
+        # Select a sound found
         parm = self.get_value(YMF825_class.LOAD, YMF825_class.PARAMETER['Sound Number'])
+        if bank_first and bank_parm['value'] * 1000 + parm['value'] in self.sound_files:
+            return
+
         parm['value'] = 0
-        for filenum in list(range(1000)):
-            if len(self.sound_files[filenum]) >= 5:
-                parm['value'] = filenum
-                break
+        if bank_first:
+            for key in self.sound_files:
+                if key // 1000 == bank_parm['value']:
+                    parm['value'] = key % 1000
+                    break
+
+        elif len(self.sound_files) > 0:
+            bank_parm['value'] = self.sound_files[0] // 1000
+            parm['value'] = self.sound_files[0] % 1000
 
-    # Send the current parameter edited
+    # Send the current parameter edited to the tone slot to edit
     def send_parameters(self, voice_params):
-        address_voices = bytearray([0x00,0x90])
+        self.set_tone(self.edit_tone, voice_params)
+        self.send_tones()
+
+    # Set a tone image (30 bytes) to a tone slot
+    def set_tone(self, slot, voice_params):
+        tone = self._tone_slots[slot]
+        if tone != voice_params:
+            tone[:] = voice_params
+            self._tone_slots_dirty |= (1 << slot)
+
+    # Send the tone slots to YMF825 if changed.
+    #   The burst writes the slots from 0 to the last changed one.
+    def send_tones(self):
+        if self._tone_slots_dirty == 0:
+            return
+
+        slots = 0
+        while self._tone_slots_dirty >> slots:
+            slots += 1
+
+        self._tone_slots_dirty = 0
+        address_voices = bytearray([0x00, 0x80 | slots])
         trailer = bytearray([0x80,0x03,0x81,0x80])
         sound_params = bytearray([])
         sound_params += address_voices
-        for v in list(range(16)):
-            sound_params += voice_params
+        for v in list(range(slots)):
+            sound_params += self._tone_slots[v]
             
         sound_params += trailer
 #        print('SOUND PARAMETERS:', len(sound_params), sound_params)
@@ -1095,38 +2201,147 @@ class YMF825_class:
         self.spi_write_byte(0x08,0x00)
 #        sleep(0.2)
         self.spi_write(0x07, sound_params)
-        sleep(0.2)
+        self._upload_done()
+
+    # Start the settle time after an upload
+    def _upload_done(self):
+        self._settle_deadline = ticks_add(ticks_ms(), YMF825_class.UPLOAD_SETTLE_MS)
+
+    # Mark the tone edited to upload later
+    def mark_tone_edited(self):
+        self._tone_edited = True
+
+    # Mark an equalizer (0..2) edited to upload later
+    def mark_equalizer_edited(self, eqno):
+        self._equalizers_edited |= (1 << eqno)
+
+    # Upload the edited tone and equalizers.
+    #   Many edits marked in an interval are uploaded once with the latest values.
+    async def send_edits(self):
+        if self._tone_edited:
+            await self.settle()
+            self._tone_edited = False
+            self.send_edited_sound_param()
+
+        # Tone slots set by the program changes in the multi-timbral mode
+        if self._tone_slots_dirty:
+            await self.settle()
+            self.send_tones()
+
+        for eqno in list(range(3)):
+            if self._equalizers_edited & (1 << eqno):
+                await self.settle()
+                self._equalizers_edited &= ~(1 << eqno)
+                self.send_equalizer_parameters(eqno)
+
+    # Wait for the last upload to settle without blocking the other tasks.
+    #   Call this before the next upload, MIDI notes are played meanwhile.
+    async def settle(self):
+        remain = ticks_diff(self._settle_deadline, ticks_ms())
+        if remain > 0:
+            await asyncio.sleep(remain / 1000)
+
+    # Map a MIDI channel (0..15) to a tone slot (0..15)
+    def map_channel_tone(self, channel, slot):
+        self._channel_tone[channel] = slot
+
+    # Multi-timbral mode: MIDI channel N plays the tone slot N.
+    # Otherwise all the channels play the tone slot to edit.
+    def set_multi_timbral(self, multi):
+        for channel in list(range(16)):
+            self.map_channel_tone(channel, channel if multi else self.edit_tone)
+
+    # Set the tone slot to edit and the multi-timbral mode as the LOAD parameters.
+    #   The sounds loaded and edited go to the tone slot to edit.
+    #   Without the multi-timbral mode all the channels play it, so the editor sound is uploaded to it.
+    def set_edit_tone(self):
+        self.edit_tone = self.get_value(YMF825_class.LOAD, YMF825_class.PARAMETER['Tone Slot'])['value']
+        self._tone_requests[self.edit_tone] = -1
+        multi = self.get_value(YMF825_class.LOAD, YMF825_class.PARAMETER['Multi Timbral'])['value'] == 1
+        self.set_multi_timbral(multi)
+        if not multi:
+            self.mark_tone_edited()
+
+    # Set the tone image of a binary sound patch to a tone slot, uploaded by send_edits()
+    def set_tone_of_patch(self, slot, buf):
+        self.set_tone(slot, buf[ymf825_codec.PATCH_TONE:ymf825_codec.PATCH_TONE + YMF825_class.TONE_BYTES])
+
+    # Compile the tone parameters schema.
+    #   self._tone_writers[byte]: (parameter, operator, patch position) written to a tone image byte
+    #                             in the schema order (operator=-1 for GENERAL).
+    #                             The parameter value is at the patch position in a binary sound patch.
+    #   self._tone_bytes[(target, name)]: tone image byte of a parameter for each operator.
+    def compile_tone_schema(self):
+        self._tone_writers = [[] for pos in list(range(YMF825_class.TONE_BYTES))]
+        self._tone_bytes = {}
 
-    # Send the current sound parameter to YMF825
-    def send_edited_sound_param(self):
         # General Parameters: 30bytes
-        sound_param = bytearray(30)
         for param in YMF825_class.YMF825_PARM[YMF825_class.GENERAL]:
-            val        = param['value']
             byte_order = param['parm_pos']
-            self_mask  = param['val_mask']
-            shift_left = param['shift']
-            data_mask  = param['mask']
-            sound_param[byte_order] = (sound_param[byte_order] & data_mask) | ((val & self_mask) << shift_left)
+            pos = ymf825_codec.PATCH_GENERAL + ymf825_codec.GENERAL_NAMES.index(param['name'])
+            self._tone_writers[byte_order].append((param, -1, pos))
+            self._tone_bytes[(YMF825_class.GENERAL, param['name'])] = (byte_order,)
 
         # Operators Parameters: OP1=[4]..[10] / OP2=[11]..[17] / OP3=[18]..[24] / OP4=[25]..[31]
         for opr in list(range(4)):
             for param in YMF825_class.YMF825_PARM[YMF825_class.OPERATORS]:
-                val        = param['value'][opr]
                 byte_order = param['parm_pos'] + opr * 7
-                self_mask  = param['val_mask']
-                shift_left = param['shift']
-                data_mask  = param['mask']
-                sound_param[byte_order] = (sound_param[byte_order] & data_mask) | ((val & self_mask) << shift_left)
+                pos = ymf825_codec.PATCH_OPERATORS + ymf825_codec.OPERATOR_NAMES.index(param['name']) * 4 + opr
+                self._tone_writers[byte_order].append((param, opr, pos))
+
+        for param in YMF825_class.YMF825_PARM[YMF825_class.OPERATORS]:
+            self._tone_bytes[(YMF825_class.OPERATORS, param['name'])] = tuple([param['parm_pos'] + opr * 7 for opr in list(range(4))])
+
+    # Make a tone image byte from its parameters, the byte is marked dirty if changed
+    def _compile_tone_byte(self, byte_order):
+        data = 0
+        for param, opr, pos in self._tone_writers[byte_order]:
+            val = param.value if opr < 0 else param.value[opr]
+            data = (data & param.mask) | ((val & param.val_mask) << param.shift)
+
+        self._set_tone_byte(byte_order, data)
+
+    # Set a tone image byte, the byte is marked dirty if changed
+    def _set_tone_byte(self, byte_order, data):
+        if self._tone_image[byte_order] != data:
+            self._tone_image[byte_order] = data
+            if not self._tone_image_dirty[byte_order]:
+                self._tone_image_dirty[byte_order] = 1
+                self._tone_image_changes += 1
+
+    # Make the whole tone image (after loading a sound)
+    def compile_tone(self):
+        for byte_order in list(range(YMF825_class.TONE_BYTES)):
+            self._compile_tone_byte(byte_order)
+
+    # Patch the tone image byte of an edited parameter
+    def patch_tone(self, target, parameter, operator=0):
+        tone_bytes = self._tone_bytes.get((target, parameter))
+        if tone_bytes is not None:
+            self._compile_tone_byte(tone_bytes[0] if target == YMF825_class.GENERAL else tone_bytes[operator])
+
+    # Send the current sound parameter to YMF825
+    #   Nothing is sent if the tone image has not been changed since the last upload.
+    def send_edited_sound_param(self):
+        if self._tone_image_changes == 0 and self._tone_image_slot == self.edit_tone:
+            return
+
+#        print('TONE BYTES CHANGED:', [pos for pos in list(range(YMF825_class.TONE_BYTES)) if self._tone_image_dirty[pos]])
+        for pos in list(range(YMF825_class.TONE_BYTES)):
+            self._tone_image_dirty[pos] = 0
+
+        self._tone_image_changes = 0
+        self._tone_image_slot = self.edit_tone
 
         # DEBUG: show parameters
+#        sound_param = self._tone_image
 #        print('PARAM:', hex(sound_param[0]), hex(sound_param[0]))
 #        for op in list(range(4)):
 #            bt = op * 7 + 2
 #            print('  OP' + str(op) + ':', hex(sound_param[bt]), hex(sound_param[bt+1]), hex(sound_param[bt+2]), hex(sound_param[bt+3]), hex(sound_param[bt+4]), hex(sound_param[bt+5]), hex(sound_param[bt+6]))
 
         # Send sound parameters to YMF825
-        self.send_parameters(sound_param)
+        self.send_parameters(self._tone_image)
         return
 
     # YMF825 setup
@@ -1168,7 +2383,7 @@ class YMF825_class:
         self.spi_write_byte(0x18,0x00)
         sleep(0.2)
 
-        # Default sound
+        # Default sound in all the tone slots
         voice_params = bytearray([
             0x01,0x85,
             0x00,0x7F,0xF4,0xBB,0x00,0x10,0x40,
@@ -1177,7 +2392,11 @@ class YMF825_class:
             0x00,0xAF,0xA0,0x0E,0x01,0x10,0x40,
         ])
 
-        self.send_parameters(voice_params)
+        for slot in list(range(YMF825_class.TONE_SLOTS)):
+            self.set_tone(slot, voice_params)
+
+        self.send_tones()
+        sleep(YMF825_class.UPLOAD_SETTLE_MS / 1000)
         self.set_chanel()
 
 #        self.reverse_parameters(voice_params)
@@ -1194,113 +2413,117 @@ class YMF825_class:
         self.spi_write_byte(0x13,0x00)
         sleep(0.2)
 
-    def get_voice(self, notenum, note_on = True):
-        # Vacant voice
-#        print('GET VOICE:', notenum, note_on)
-        voice = -1
-        if note_on:
-            voice = self._voice_note.index(None) if None in self._voice_note else -1
-
-        # Same voice has been used
-        off_voice = -1
-        if notenum in self._voice_note:
-            # Send note it off
-            off_voice = self._voice_note.index(notenum)
-            self._note_on(off_voice, YMF825_class.NOTENUM_HI[notenum], YMF825_class.NOTENUM_LO[notenum], 0)
-
-            # Aging voice flag (-1)
-            self._voice_note[off_voice] = -1
-            self._voice_duration[off_voice] = 0
-#            print('  --->OFF  VOICE:', off_voice, notenum)
-            
-        if not note_on:
-#            print('<---NOTE OFF:', self._voice_note)
-            return off_voice
-
-        # Return the vacant voice
-        if voice >= 0:
-#            print('<---VAC VOICE:', voice)
-            return voice
-        
-        # Find a voice having the maximum duration
-        max_dur = -10
-        for v in list(range(len(self._voice_note))):
-            if self._voice_note[v] is not None:
-                # Get the maximun duration voice in used voices
-                dur = self._voice_duration[v]
-                if dur > max_dur:
-                    voice = v
-                    max_dur = dur
-                
-                # Increment duration
-                self._voice_duration[v] = self._voice_duration[v] + 1
-
-        # Use an aging_voice if used voice is not available
-#        print('MAX DURATION=', voice, self._voice_duration[voice], self._voice_note)
-        if self._voice_note[voice] >= 0:
-            # Note off the maximum duration note
-            note = self._voice_note[voice]
-            self._note_on(voice, YMF825_class.NOTENUM_HI[note], YMF825_class.NOTENUM_LO[note], 0)
-
-        # Return maximum duration voice
-        self._voice_note[voice] = None
-        self._voice_duration[voice] = -1
-#        print('<---MAX VOICE:', voice)
-        return voice
-
     # voice: Voice number in YMF825 (0..15)
     # Note on with native values
     #   fnumh, fnuml:: 2byte data to play, byte data for a note is in notenum_hi[note] and notenum_lo[note]
     # Note on (play a note).
     # NOTICE:: Never call this directory, use play_by_scale() or play_by_timbre_scale().
     #   fnumh, fnuml:: 2byte data to play, byte data for a note is in notenum_hi[note] and notenum_lo[note].
-    def _note_on(self, voice, notenum_h, notenum_l, velocity = 0x1c):
+    #   tone:: Tone slot to play (0..15).
+    def _note_on(self, voice, notenum_h, notenum_l, velocity = 0x1c, tone = 0):
 #        print('_NOTE:', 'OFF' if velocity == 0 else 'ON ', voice, notenum_h, notenum_l, velocity)
         # Send note on to YMF825
-        # 0x40=Note ON / 0x00=Note OFF: b0NMEVVVV (N=Note ON/OFF, M=Mute, E=EG_REST, V=Voice)
+        # 0x40=Note ON / 0x00=Note OFF: b0NMETTTT (N=Note ON/OFF, M=Mute, E=EG_REST, T=Tone)
         
         # Note ON
         if velocity != 0:
-            self.spi_write_byte(0x0B, voice & 0x0f)
-            self.spi_write_byte(0x0C, velocity & 0x7c)
-            self.spi_write_byte(0x0D, notenum_h)
-            self.spi_write_byte(0x0E, notenum_l)
-            self.spi_write_byte(0x0F, 0x40 | (voice&0x0f))
-
-        # Note OFF
+            self.spi_write_reg(0x0B, voice & 0x0f)
+            self.spi_write_reg(0x0C, velocity & 0x7c)
+            self.spi_write_reg(0x0D, notenum_h)
+            self.spi_write_reg(0x0E, notenum_l)
+            self.spi_write_reg(0x0F, 0x40 | (tone&0x0f))
+            self._voice_tone[voice & 0x0f] = tone & 0x0f
+
+        # Note OFF (the voice must be selected, another voice may have been selected after its note on)
+        #   The tone of the note on is kept for the release.
         else:
-            self.spi_write_byte(0x0F, voice&0x0f)
+            self.spi_write_reg(0x0B, voice & 0x0f)
+            self.spi_write_reg(0x0F, self._voice_tone[voice & 0x0f])
 
-    # Note ON in vacant voice with MIDI note number (0..127)
-    def note_on(self, notenum, velocity=0x1c):
+    # Note ON in vacant voice with MIDI note number (0..127) and MIDI channel (0..15)
+    def note_on(self, notenum, velocity=0x1c, channel=0):
         if velocity == 0:
             self.note_off(notenum)
             return
         
-        voice = self.get_voice(notenum)
-        if voice >= 0:
-            notenum = notenum % 127
-#            self._note_on(self.get_voice(notenum), YMF825_class.NOTENUM_HI[notenum], YMF825_class.NOTENUM_LO[notenum], velocity & 0x7c)
-            self._note_on(voice, YMF825_class.NOTENUM_HI[notenum], YMF825_class.NOTENUM_LO[notenum], velocity & 0x7c)
-            self._voice_note[voice] = notenum
-            self._voice_duration[voice] = 0
-            print('<---NOTE ON:', self._voice_note)
-            
-#        else:
-#            print('===NO VACANT VOICE==:', notenum, velocity)
-#            print('NOTE ON:', notenum, velocity, '@', voice)
-#            print('NOTE ON:', notenum, velocity, '@', voice, self._voice_note, self._voice_duration)
+        # Same note is playing: note it off (the retrigger policy re-uses its voice)
+        allocator = self._voice_allocator
+        if not allocator.retrigger:
+            voice = allocator.release(notenum)
+            if voice >= 0:
+                self._note_on(voice, 0, 0, 0)
+
+        voice = allocator.allocate(notenum, velocity)
+
+        # Note off the stolen voice
+        if allocator.stolen:
+            self._note_on(voice, 0, 0, 0)
+
+        key = notenum % 127
+        self._note_on(voice, YMF825_class.NOTENUM_HI[key], YMF825_class.NOTENUM_LO[key], velocity & 0x7c, self._channel_tone[channel])
+#        print('<---NOTE ON:', notenum, velocity, '@', voice)
     
     # Note OFF with MIDI note number (0..127)
     def note_off(self, notenum):
         # Find the note and note it off (if available)
-        self.get_voice(notenum, False)
+        voice = self._voice_allocator.release(notenum)
+        if voice >= 0:
+            self._note_on(voice, 0, 0, 0)
+
+    # Change the voice steal policy (Voice_allocator_class.STEAL_*)
+    def set_steal_policy(self, policy):
+        self._voice_allocator.set_policy(policy)
+
+    # Raw MIDI event handlers (event = status << 16 | data1 << 8 | data2)
+    def midi_note_on(self, event):
+        self.note_on((event >> 8) & 0x7f, event & 0x7f, (event >> 16) & 0x0f)
+
+    def midi_note_off(self, event):
+        self.note_off((event >> 8) & 0x7f)
+
+    # Bank select: CC0 is the sound bank, CC32 is the sound number / 128
+    def midi_control_change(self, event):
+        control = (event >> 8) & 0x7f
+        if control == 0x00:
+            self._bank_select_msb = event & 0x7f
+        elif control == 0x20:
+            self._bank_select_lsb = event & 0x7f
+
+    # Program change to the sound number CC32 * 128 + program in the bank CC0.
+    #   A cached sound is set at once, the others are loaded by change_program().
+    #   In the multi-timbral mode, a program change on a channel playing another tone slot
+    #   than the one to edit sets the tone image of the slot only.
+    def midi_program_change(self, event):
+        bank = self._bank_select_msb
+        number = self._bank_select_lsb * 128 + ((event >> 8) & 0x7f)
+        if bank >= 10 or number >= 1000:
+            return
+
+        slot = self._channel_tone[(event >> 16) & 0x0f]
+        if slot != self.edit_tone:
+            self._tone_requests[slot] = -1
+            buf = self.cached_patch(bank, number)
+            if buf is None:
+                self._tone_requests[slot] = bank * 1000 + number
+            else:
+                self.set_tone_of_patch(slot, buf)
+
+            return
+
+        self._program_request = -1
+        if self.recall_cached_patch(bank, number):
+            self._program_loaded(bank, number)
+        else:
+            self._program_request = bank * 1000 + number
 
     #Note off
     #  Turn off the note playing
     def all_note_off(self):
-        for voice in list(range(15)):
-            self.spi_write_byte(0x0F,0x20 + voice)
+        for voice in list(range(16)):
+            self.spi_write_reg(0x0B, voice)
+            self.spi_write_reg(0x0F, 0x20 + self._voice_tone[voice])
+
+        self._voice_allocator.release_all()
 
 #    def pitch_bend(self, value):
 #        self.spi_write_byte(0x12,0x1f)
@@ -1358,124 +2581,200 @@ class YMF825_class:
         print('EQ:', filter_name, a0, a1, a2, b0, b1, b2)
         return {'a0': a0, 'a1': a1, 'a2': a2, 'b0': b0, 'b1': b1, 'b2': b2}
 
-    def send_equalizer_parameters(self, eqno):
+    # Write an equalizer coefficient to the CEQ buffer (CEQ0..4 for b0, b1, b2, a1, a2).
+    #   CEQ format: 24bit two's complement, sign + 3bit integer + 20bit fraction (-8.0 <= ceq < 8.0)
+    def set_ceq(self, ceq_num, ceq):
+        val = ymf825_codec.encode_ceq(ceq)
+        pos = ceq_num * 3 + 1
+        self.equalizer_ceq[pos    ] = val >> 16
+        self.equalizer_ceq[pos + 1] = (val >> 8) & 0xff
+        self.equalizer_ceq[pos + 2] = val & 0xff
+
+    # Magnitude curve of the 3 equalizers in cascade with the CEQ blocks YMF825 gets.
+    #   curve:: bytearray, the dot row (0: top) in height dots is set for each column,
+    #           the columns are from 20Hz to 20kHz in log scale.
+    def equalizer_curve(self, curve, height):
+        equalizer = YMF825_class.YMF825_PARM[YMF825_class.EQUALIZERS]
+        coefficients = []
+        for eqno in list(range(3)):
+            self.make_ceq_block(equalizer[0].value[eqno], equalizer[1].value[eqno], equalizer[2].value[eqno])
+            block = self.equalizer_ceq[1:16]
+            coefficients.append([ymf825_codec.ceq_block_value(block, ceq_num) for ceq_num in list(range(5))])
+
+        columns = len(curve)
+        for col in list(range(columns)):
+            freq = 0.02 * 1000.0 ** (col / (columns - 1))
+            curve[col] = ymf825_codec.curve_row(ymf825_codec.cascade_magnitude(coefficients, freq), height)
+
+    # Make CEQ0..4 bytes data of a filter in the CEQ buffer.
+    #   The blocks made are cached, the cutoff and Q are rounded as displayed.
+    def make_ceq_block(self, filter_type, cutoff_freq, q_factor):
+        key = (filter_type, round(cutoff_freq, 4), round(q_factor, 4))
+        block = self._ceq_cache.get(key)
+        if block is not None:
+            self.ceq_cache_hits += 1
+            self._ceq_cache_order.remove(key)
+            self._ceq_cache_order.append(key)
+            self.equalizer_ceq[1:16] = block
+            return
 
-        # Floating point decoder
-        def dec2bin_frac(dec, sign = False, digits=54):
-#            dec=Decimal(str(dec))
-            dec=float(str(dec))
-            mantissa=''
-            nth=0
-            first=0
-            rb=False
-            while dec:
-                if dec  >= 1:
-#                    mantissa += '1'
-                    mantissa += '1' if not sign else '0'
-                    dec = dec -1
-                    if first==0:
-                        first=nth
-                else:
-                    if nth!=0:
-#                        mantissa += '0'
-                        mantissa += '0' if not sign else '1'
-                    else:
-                        mantissa += '0.'
-                dec*=2
-                nth+=1
-                if nth-first==digits:
-                    if dec != 0:
-                        rb=True
-                    break
+        self.ceq_cache_misses += 1
+        filter_params = self.calc_biquad_filter(key[0], key[1], key[2])
+        self.set_ceq(0, filter_params['b0'])
+        self.set_ceq(1, filter_params['b1'])
+        self.set_ceq(2, filter_params['b2'])
+        self.set_ceq(3, filter_params['a1'])
+        self.set_ceq(4, filter_params['a2'])
+        self.cache_ceq_block(key[0], key[1], key[2], bytes(self.equalizer_ceq[1:16]))
+
+    # Cache a CEQ block (15 bytes) of a filter
+    def cache_ceq_block(self, filter_type, cutoff_freq, q_factor, block):
+        key = (filter_type, round(cutoff_freq, 4), round(q_factor, 4))
+        if key in self._ceq_cache:
+            return
 
-            carry = False
-            if sign:
-#                print('SIGN BFR:', mantissa)
-                revs = ''
-                lman = len(mantissa)
-                for b in range(1,lman-1):
-                    if mantissa[-b] == '0':
-                        revs = '1' + revs
-                        if b != lman-2:
-                            revs = mantissa[2:lman-b] + revs
-
-                        break
-                    else:
-                        revs = '0' + revs
-                        if b == lman-2:
-                            carry = True
+        # Forget the least recently used block
+        if len(self._ceq_cache_order) >= YMF825_class.CEQ_CACHE_SIZE:
+            del self._ceq_cache[self._ceq_cache_order.pop(0)]
 
-                mantissa = '0.' + revs
-#                print('SIGN AFT:', mantissa, carry)
+        self._ceq_cache[key] = block
+        self._ceq_cache_order.append(key)
 
-            return mantissa,carry,rb
+    # CEQ cache counters: (hits, misses, blocks cached)
+    def ceq_cache_stats(self):
+        return (self.ceq_cache_hits, self.ceq_cache_misses, len(self._ceq_cache_order))
 
-        # Make CEQ# bytes data
-        def make_ceq_bytes(ceq_num, ceq):
-            ceq_num = ceq_num * 3 + 1
+    # Cached binary sound patch of a sound.
+    #   Returns None if the sound is not cached or its file has been changed.
+    def cached_patch(self, bank, number):
+        key = bank * 1000 + number
+        cached = self._patch_cache.get(key)
+        if cached is None or cached[0] != self.sound_library.crc_of(bank, number):
+            self.patch_cache_misses += 1
+            return None
 
-            if ceq < 0.0:
-                sign = True
-                self.equalizer_ceq[ceq_num] = 0x80
-                ceq = -ceq
-                ceq_int = ( ~int(ceq) ) & 0x07
-                ceq_frc = ceq - int(ceq)
+        self.patch_cache_hits += 1
+        self._patch_cache_order.remove(key)
+        self._patch_cache_order.append(key)
+        return cached[1]
+
+    # Set a cached sound patch to the parameters without any file access.
+    #   Returns False if the sound is not cached or its file has been changed.
+    def recall_cached_patch(self, bank, number):
+        buf = self.cached_patch(bank, number)
+        return buf is not None and self.apply_patch(buf)
+
+    # Cache a binary sound patch of a sound.
+    #   buf:: binary sound patch, the current parameters are cached if None
+    def cache_patch(self, bank, number, buf=None):
+        key = bank * 1000 + number
+        cached = self._patch_cache.get(key)
+        if cached is None:
+            # Re-use the buffer of the least recently used sound
+            if len(self._patch_cache_order) >= YMF825_class.PATCH_CACHE_SIZE:
+                cached = self._patch_cache.pop(self._patch_cache_order.pop(0))
             else:
-                sign = False
-                self.equalizer_ceq[ceq_num+1] = 0x00
-                ceq_int = int(ceq) & 0x07
-                ceq_frc = ceq - int(ceq)
-
-            if ceq_frc != 0.0:
-                mantissa,carry,rb = dec2bin_frac( ceq_frc, sign, 23 )
-                if carry:
-                    ceq_int += 1
-
-#                print('EQUALIZER BITS and CARRY = INT:', mantissa, carry, '=', ceq_int)
-                self.equalizer_ceq[ceq_num] = self.equalizer_ceq[ceq_num] | ( ceq_int << 4 )
-#                print('FRC:: CEQ INT SHIFT ARRAY FRAC=', ceq, ceq_int, ( ceq_int << 4 ), self.equalizer_ceq[ceq_num], ceq_frc)
-                for b in range(2,len( mantissa )):
-#                    print('BIT:', b, '=', mantissa[b])
-                    if mantissa[b] == '1':
-                        if   b <=  5:       #  2.. 5
-                            self.equalizer_ceq[ceq_num  ] = self.equalizer_ceq[ceq_num  ] | ( 0x01 << ( 5-b) )
-                        elif b <= 13:       #  6..13
-                            self.equalizer_ceq[ceq_num+1] = self.equalizer_ceq[ceq_num+1] | ( 0x01 << (13-b) )
-                        elif b <= 21:       # 14..21
-                            self.equalizer_ceq[ceq_num+2] = self.equalizer_ceq[ceq_num+2] | ( 0x01 << (21-b) )
+                cached = [None, bytearray(ymf825_codec.PATCH_SIZE)]
+
+            self._patch_cache[key] = cached
 
+        else:
+            self._patch_cache_order.remove(key)
+
+        self._patch_cache_order.append(key)
+        cached[0] = self.sound_library.crc_of(bank, number)
+        if buf is None:
+            self.make_patch(cached[1], 0)
+        else:
+            cached[1][:] = buf
+
+    # A sound has been set by a program change: upload it, show it later and prefetch around it
+    def _program_loaded(self, bank, number):
+        self.mark_tone_edited()
+        for eqno in list(range(3)):
+            self.mark_equalizer_edited(eqno)
+
+        for target in [YMF825_class.SAVE, YMF825_class.LOAD]:
+            self.get_value(target, YMF825_class.PARAMETER['Sound Bank'])['value'] = bank
+            self.get_value(target, YMF825_class.PARAMETER['Sound Number'])['value'] = number
+
+        self._program_changed = True
+        self._prefetch_key = bank * 1000 + number
+        self._prefetch_step = 0
+
+    # Load the sound of the program change requested, set a tone slot requested,
+    # or prefetch a sound around the last program change.
+    #   Called in the program_change task, a file is read in a call at most.
+    #   Returns True if a program change has set a sound since the last call.
+    def change_program(self):
+        if self._program_request >= 0:
+            key = self._program_request
+            self._program_request = -1
+            if self.sound_library.crc_of(key // 1000, key % 1000) is None:
+                print('NO SOUND FOR PROGRAM:', key // 1000, key % 1000)
+
+            elif self.load_sound(key // 1000, key % 1000):
+                self.cache_patch(key // 1000, key % 1000)
+                self._program_loaded(key // 1000, key % 1000)
+
+        elif not self.load_tone_request() and self._prefetch_key >= 0:
+            self._prefetch_step += 1
+            if self._prefetch_step > YMF825_class.PREFETCH_RANGE * 2:
+                self._prefetch_key = -1
             else:
-                if sign:
-                    ceq_int += 1
+                offset = (self._prefetch_step + 1) // 2
+                self.prefetch_sound(self._prefetch_key // 1000, self._prefetch_key % 1000 + (offset if self._prefetch_step % 2 else -offset))
+
+        changed = self._program_changed
+        self._program_changed = False
+        return changed
+
+    # Read a sound requested by a program change and set it to its tone slot.
+    #   The current parameters are not changed.
+    #   Returns False if no tone slot is requested.
+    def load_tone_request(self):
+        for slot in list(range(YMF825_class.TONE_SLOTS)):
+            key = self._tone_requests[slot]
+            if key >= 0:
+                self._tone_requests[slot] = -1
+                if self.read_sound(key // 1000, key % 1000, self._prefetch_patch):
+                    self.cache_patch(key // 1000, key % 1000, self._prefetch_patch)
+                    self.set_tone_of_patch(slot, self._prefetch_patch)
+                else:
+                    print('NO SOUND FOR PROGRAM:', key // 1000, key % 1000)
 
-                self.equalizer_ceq[ceq_num] = self.equalizer_ceq[ceq_num] | ( ceq_int << 4 )
-#                print('INT:: CEQ INT SHIFT ARRAY FRAC=', ceq, ceq_int, ( ceq_int << 4 ), self.equalizer_ceq[ceq_num], ceq_frc)
+                return True
 
-#            print('EQL::', self.equalizer_ceq[ceq_num], self.equalizer_ceq[ceq_num+1], self.equalizer_ceq[ceq_num+2])
+        return False
 
-        # Equalizer parameters buffer (address + 15bytes)
-        self.equalizer_ceq = bytearray(16)
-        equalizer = YMF825_class.YMF825_PARM[YMF825_class.EQUALIZERS]
-        filter_params = self.calc_biquad_filter(equalizer[0]['value'][eqno], equalizer[1]['value'][eqno], equalizer[2]['value'][eqno])
-        print('EQ', eqno, filter_params)
+    # Read a sound into the sound patch cache, the current parameters are not changed
+    def prefetch_sound(self, bank, number):
+        if number < 0 or number >= 1000:
+            return
+
+        crc = self.sound_library.crc_of(bank, number)
+        cached = self._patch_cache.get(bank * 1000 + number)
+        if crc is None or (cached is not None and cached[0] == crc):
+            return
 
-        # Clear CEQ bytes data
-        for b in range(15):
-            self.equalizer_ceq[b] = 0x00
+        print('PREFETCH:', bank, number)
+        if self.read_sound(bank, number, self._prefetch_patch):
+            self.cache_patch(bank, number, self._prefetch_patch)
 
-        # Make CEQ0 bytes data
-        make_ceq_bytes(0, filter_params['b0'])
-        make_ceq_bytes(1, filter_params['b1'])
-        make_ceq_bytes(2, filter_params['b2'])
-        make_ceq_bytes(3, filter_params['a1'])
-        make_ceq_bytes(4, filter_params['a2'])
+    # Sound patch cache counters: (hits, misses, sounds cached, memory budget in bytes)
+    def patch_cache_stats(self):
+        return (self.patch_cache_hits, self.patch_cache_misses, len(self._patch_cache_order), YMF825_class.PATCH_CACHE_SIZE * ymf825_codec.PATCH_SIZE)
+
+    def send_equalizer_parameters(self, eqno):
+        equalizer = YMF825_class.YMF825_PARM[YMF825_class.EQUALIZERS]
+        self.make_ceq_block(equalizer[0]['value'][eqno], equalizer[1]['value'][eqno], equalizer[2]['value'][eqno])
 
         #Burst write mode and all key notes off
         print('EQUALIZER', eqno, ':', self.equalizer_ceq)
         self.spi_write_byte(0x08, 0xF6)
         self.spi_write_byte(0x08, 0x00)
         self.spi_write(32 + eqno, self.equalizer_ceq)
-        sleep(0.2)
+        self._upload_done()
 
 
 ###################################
@@ -1508,10 +2807,16 @@ class Application_class:
         {'title': ['EQLZ:', '[3]', '', '', ''       ], 'target': YMF825_class.EQUALIZERS, 'range': ( 0, 3), 'unit': 2},
         
         {'title': ['SAVE SOUND FILE', '', '', '', ''], 'target': YMF825_class.SAVE,       'range': ( 0, 4), 'unit': 0},
-        {'title': ['LOAD SOUND FILE', '', '', '', ''], 'target': YMF825_class.LOAD,       'range': ( 0, 4), 'unit': 0}
+        {'title': ['LOAD SOUND FILE', '', '', '', ''], 'target': YMF825_class.LOAD,       'range': ( 0, 6), 'unit': 0}
     ]
     
     DISPLAY_PAGE_MAX = len(DISPLAY_PAGE_FORMAT)
+
+    # Equalizer curve on the EQUALIZERS page: dot position, size and points (20Hz..20kHz)
+    EQ_CURVE_Y = 86
+    EQ_CURVE_WIDTH = 128
+    EQ_CURVE_HEIGHT = 40
+    EQ_CURVE_POINTS = 64
     LABEL_TO_DISPLAY = {}	# Bind data and display label with tuple: {(target, data name, unit) : label}
     
     def __init__(self):
@@ -1523,6 +2828,11 @@ class Application_class:
                 Application_class.DISPLAY_TEXTS[row].append('')
                 Application_class.DISPLAY_LABELS[row].append(None)
 
+        # Equalizer curve (see show_equalizer_curve())
+        self._eq_curve = bytearray(Application_class.EQ_CURVE_POINTS)
+        self._eq_bitmap = None
+        self._eq_grid = None
+
     # Set text on the display
     def set_text(self, row, col, str):
         Application_class.DISPLAY_TEXTS[row][col] = str
@@ -1548,6 +2858,10 @@ class Application_class:
                 Application_class.DISPLAY_LABELS[row][col] = label
                 OLED_obj.append_object(label)
 
+        self._eq_bitmap, self._eq_grid = OLED_obj.new_bitmap(0, Application_class.EQ_CURVE_Y, Application_class.EQ_CURVE_WIDTH, Application_class.EQ_CURVE_HEIGHT)
+        self._eq_grid.hidden = True
+        OLED_obj.append_object(self._eq_grid)
+
         self.splash_screen()
 
     # Show a parameter on its label
@@ -1573,6 +2887,47 @@ class Application_class:
         Application_class.DISPLAY_TEXTS[row][1] = YMF825_class.ALOGOLITHM[algo][row-4]
         Application_class.DISPLAY_LABELS[row][1].text = Application_class.DISPLAY_TEXTS[row][1]
 
+    # Draw the magnitude curve of the equalizers (+12dB..-36dB, 0dB dotted) under the parameters
+    def show_equalizer_curve(self):
+        bitmap = self._eq_bitmap
+        height = Application_class.EQ_CURVE_HEIGHT
+        bitmap.fill(0)
+        zero = ymf825_codec.curve_row(0.0, height)
+        for x in list(range(0, Application_class.EQ_CURVE_WIDTH, 4)):
+            bitmap[x, zero] = 1
+
+        curve = self._eq_curve
+        YMF825_obj.equalizer_curve(curve, height)
+        dots = Application_class.EQ_CURVE_WIDTH // len(curve)
+        prev = curve[0]
+        for pnt in list(range(len(curve))):
+            # Vertical line from the previous point, then the point
+            row = curve[pnt]
+            for y in list(range(min(prev, row), max(prev, row) + 1)):
+                bitmap[pnt * dots, y] = 1
+
+            for x in list(range(pnt * dots + 1, pnt * dots + dots)):
+                bitmap[x, row] = 1
+
+            prev = row
+
+    # Show the sound set by a program change on the current page.
+    #   The LOAD and SAVE pages update the sound fields only, changing to the LOAD page
+    #   would turn all the notes off and search the sound files again.
+    def show_program(self):
+        target = Application_class.DISPLAY_PAGE_FORMAT[Application_class.DISPLAY_PAGE]['target']
+        if target == YMF825_class.LOAD:
+            self.show_parameter(target, YMF825_class.PARAMETER['Sound Bank'], 0)
+            self.show_parameter(target, YMF825_class.PARAMETER['Sound Number'], 0)
+
+        elif target == YMF825_class.SAVE:
+            self.show_parameter(target, YMF825_class.PARAMETER['Sound Bank'], 0)
+            self.show_parameter(target, YMF825_class.PARAMETER['Sound Number'], 0)
+            self.show_parameter(target, YMF825_class.PARAMETER['Sound Name'], 0)
+
+        else:
+            self.change_page()
+
     # Change the current page to edit
     def change_page(self):
         # Page format
@@ -1593,6 +2948,9 @@ class Application_class:
         # WAVE has a special treatment
         show_wave_names = False
 
+        # The equalizer curve on the EQUALIZERS page only
+        self._eq_grid.hidden = target != YMF825_class.EQUALIZERS
+
         # GENERAL parameter's page
         if   target == YMF825_class.GENERAL:
             # Show USB MIDI mode
@@ -1704,11 +3062,13 @@ class Application_class:
                         Application_class.DISPLAY_TEXTS[row][col] = ''
                         Application_class.DISPLAY_LABELS[row][col].text = Application_class.DISPLAY_TEXTS[row][col]
 
+            self.show_equalizer_curve()
+
         # SAVE/LOAD parameter's page
         elif target == YMF825_class.SAVE or target == YMF825_class.LOAD:
             if target == YMF825_class.LOAD:
                 YMF825_obj.all_note_off()
-                YMF825_obj.find_sound_files()
+                YMF825_obj.find_sound_files(True)
             
             # Show each display line
             for row in list(range(1,11)):
@@ -1740,7 +3100,8 @@ class Application_class:
                         Application_class.DISPLAY_LABELS[row][col].text = Application_class.DISPLAY_TEXTS[row][col]
 
     # Treat 8encoder events
-    def task_8encoder(self):
+    #   The edited tone and equalizers are uploaded by upload_edits() task.
+    async def task_8encoder(self):
 #        print('8Encoder:', M5Stack_8Encoder_class.status)
         # Change the editor page
         if M5Stack_8Encoder_class.status['on_change']['rotary_inc'][7]:
@@ -1783,9 +3144,23 @@ class Application_class:
 
                     # Load bank was changed
                     if target == YMF825_class.LOAD and parm_name == YMF825_class.PARAMETER['Sound Bank']:
+                        YMF825_obj.find_sound_files(True)
+                        self.show_parameter(target, YMF825_class.PARAMETER['Sound Number'], 0)
+
+                    # Load number was changed, the sound found may be in another bank
+                    if target == YMF825_class.LOAD and parm_name == YMF825_class.PARAMETER['Sound Number']:
+                        self.show_parameter(target, YMF825_class.PARAMETER['Sound Bank'], 0)
+
+                    # Search name was edited
+                    if target == YMF825_class.LOAD and parm_name == YMF825_class.PARAMETER['Sound Name']:
                         YMF825_obj.find_sound_files()
+                        self.show_parameter(target, YMF825_class.PARAMETER['Sound Bank'], 0)
                         self.show_parameter(target, YMF825_class.PARAMETER['Sound Number'], 0)
 
+                    # Tone slot to edit or the multi-timbral mode was changed
+                    if target == YMF825_class.LOAD and (parm_name == YMF825_class.PARAMETER['Tone Slot'] or parm_name == YMF825_class.PARAMETER['Multi Timbral']):
+                        YMF825_obj.set_edit_tone()
+
                     # Save bank or number was changed
                     if target == YMF825_class.SAVE and (parm_name == YMF825_class.PARAMETER['Sound Bank'] or parm_name == YMF825_class.PARAMETER['Sound Number']):
                         self.show_parameter(target, YMF825_class.PARAMETER['Sound Number'], 0)
@@ -1798,7 +3173,7 @@ class Application_class:
 
         if target == YMF825_class.GENERAL or target == YMF825_class.OPERATORS:
             if operator_edited:
-                YMF825_obj.send_edited_sound_param()
+                YMF825_obj.mark_tone_edited()
             
             if algorithm_edited:
                 for row in list(range(4,11)):
@@ -1806,7 +3181,8 @@ class Application_class:
 
         elif target == YMF825_class.EQUALIZERS:
             if equalizer_edited:
-                YMF825_obj.send_equalizer_parameters(parm_unit)
+                YMF825_obj.mark_equalizer_edited(parm_unit)
+                self.show_equalizer_curve()
             
         elif target == YMF825_class.SAVE:
             parm = YMF825_obj.get_value(target, YMF825_class.PARAMETER['Save Sound'])
@@ -1814,7 +3190,7 @@ class Application_class:
                 if parm['value'] == 2:
                     YMF825_obj.save_parameter_file()
                     parm['value'] = 0
-                    sleep(1.0)
+                    await asyncio.sleep(1.0)
                     self.show_parameter(target, YMF825_class.PARAMETER['Save Sound'], 0)
                     self.show_parameter(target, YMF825_class.PARAMETER['Sound Number'], 0)
             
@@ -1826,9 +3202,9 @@ class Application_class:
                     result = YMF825_obj.load_parameter_file()
                     parm['value'] = 0
                     if result:
-                        YMF825_obj.send_edited_sound_param()
+                        YMF825_obj.mark_tone_edited()
                         for eqno in list(range(3)):
-                            YMF825_obj.send_equalizer_parameters(eqno)
+                            YMF825_obj.mark_equalizer_edited(eqno)
 
                     # Set loaded file to the save parameters
                     loaded = YMF825_obj.get_value(YMF825_class.LOAD, YMF825_class.PARAMETER['Sound Bank'])
@@ -1844,7 +3220,7 @@ class Application_class:
                     save   = YMF825_obj.get_value(YMF825_class.SAVE, YMF825_class.PARAMETER['Sound Name'])
                     save['value'] = YMF825_obj.get_sound_name_of_file(bank, number)
 
-                    sleep(1.0)
+                    await asyncio.sleep(1.0)
                     self.show_parameter(target, YMF825_class.PARAMETER['Load Sound'], 0)
                     self.show_parameter(YMF825_class.LOAD, YMF825_class.PARAMETER['Sound Bank'], 0)
                     self.show_parameter(YMF825_class.LOAD, YMF825_class.PARAMETER['Sound Number'], 0)
@@ -1853,7 +3229,7 @@ class Application_class:
                 # Search files
                 elif parm['value'] == 4:
                     YMF825_obj.find_sound_files()
-                    sleep(1.0)
+                    await asyncio.sleep(1.0)
                     parm['value'] = 0
                     self.show_parameter(target, YMF825_class.LOAD, 0)
                     self.show_parameter(target, YMF825_class.PARAMETER['Sound Name'], 0)
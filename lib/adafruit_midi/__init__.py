@@ -30,11 +30,17 @@ try:
 except ImportError:
     pass
 
-from .midi_message import MIDIMessage
+from .midi_message import MIDIMessage, MIDIBadEvent, channel_filter
 
 __version__ = "0.0.0+auto.0"
 __repo__ = "https://github.com/adafruit/Adafruit_CircuitPython_MIDI.git"
 
+# Message lengths including status for receive_raw(), 0 for messages it drops.
+# Channel voice messages indexed by the status high nibble (0x8-0xE)
+_RAW_VOICE_LENGTH = b"\x00\x00\x00\x00\x00\x00\x00\x00\x03\x03\x03\x03\x02\x02\x03\x00"
+# System messages indexed by the status low nibble (0xF0-0xFF), SysEx is dropped
+_RAW_SYSTEM_LENGTH = b"\x00\x02\x03\x02\x01\x01\x01\x00\x01\x01\x01\x01\x01\x01\x01\x01"
+
 
 class MIDI:
     """MIDI helper class. ``midi_in`` or ``midi_out`` *must* be set or both together.
@@ -51,7 +57,7 @@ class MIDI:
     :param int out_channel: The wire protocol output channel number (0-15)
         used by ``send`` if no channel is specified,
         defaults to 0 (MIDI Channel 1).
-    :param int in_buf_size: Maximum size of input buffer in bytes, default 30.
+    :param int in_buf_size: Size of the input ring buffer in bytes, default 30.
     :param bool debug: Debug mode, default False.
 
     """
@@ -75,10 +81,19 @@ class MIDI:
         self._out_channel = out_channel
         self.out_channel = out_channel
         self._debug = debug
-        # This input buffer holds what has been read from midi_in
-        self._in_buf = bytearray(0)
+        # This input buffer holds what has been read from midi_in.
+        # It is a fixed size ring buffer, _in_start is the offset of the first
+        # unparsed byte and _in_len the number of unparsed bytes.
+        self._in_buf = bytearray(in_buf_size)
         self._in_buf_size = in_buf_size
+        self._in_start = 0
+        self._in_len = 0
+        # Linear copy of a message (or of the whole ring) handed to the parsers
+        self._in_msg = bytearray(in_buf_size)
+        self._in_msg_view = memoryview(self._in_msg)
         self._outbuf = bytearray(4)
+        # Reused list returned by receive_many()
+        self._batch = []
         self._skipped_bytes = 0
 
     @property
@@ -124,25 +139,229 @@ class MIDI:
         ### could check _midi_in is an object OR correct object OR correct interface here?
         # If the buffer here is not full then read as much as we can fit from
         # the input port
-        if len(self._in_buf) < self._in_buf_size:
-            bytes_in = self._midi_in.read(self._in_buf_size - len(self._in_buf))
-            if bytes_in:
-                if self._debug:
-                    print("Receiving: ", [hex(i) for i in bytes_in])
-                self._in_buf.extend(bytes_in)
-                del bytes_in
+        self._read_in_buf()
+
+        # msg could still be None at this point, e.g. in middle of monster SysEx
+        return self._parse_in_buf()
+
+    def receive_many(self, budget: int = 16) -> List[MIDIMessage]:
+        """Read the MIDI port and return every complete message (event) already
+        buffered, up to ``budget`` messages. The port is read again whenever the
+        input buffer runs dry, so a whole transfer is drained in one call.
+
+        :param int budget: Maximum number of messages to return, default 16.
+        :returns list: MIDIMessage objects, empty for nothing. The list is
+            reused by the next call.
+
+        See :meth:`receive_raw` for the same drain without creating objects.
+        """
+        batch = self._batch
+        batch.clear()
+        while len(batch) < budget:
+            msg = self._parse_in_buf()
+            if msg is None:
+                if not self._read_in_buf():
+                    break
+                continue
+            batch.append(msg)
+        return batch
+
+    def receive_raw(self, events, budget: Optional[int] = None) -> int:
+        """Read the MIDI port and decode the buffered messages without creating
+        objects. Each message is written to ``events`` as a packed ``int``,
+        ``status << 16 | data1 << 8 | data2`` with missing data bytes as 0.
+        SysEx messages are dropped in this mode.
+
+        :param events: A preallocated mutable sequence of ``int``,
+            e.g. an ``array.array("L")`` or a list.
+        :param int budget: Maximum number of messages to decode,
+            defaults to ``len(events)``.
+        :returns int: Number of events written to ``events``.
+        """
+        if budget is None or budget > len(events):
+            budget = len(events)
+        count = 0
+        while count < budget:
+            event = self._parse_raw_in_buf()
+            if event < 0:
+                if not self._read_in_buf():
+                    break
+                continue
+            events[count] = event
+            count += 1
+        return count
+
+    def _read_in_buf(self) -> int:
+        """Append what is available on ``midi_in`` to the ring buffer.
+
+        :returns int: Number of bytes read.
+        """
+        free = self._in_buf_size - self._in_len
+        if not free:
+            return 0
+        bytes_in = self._midi_in.read(free)
+        if not bytes_in:
+            return 0
+        if self._debug:
+            print("Receiving: ", [hex(i) for i in bytes_in])
+
+        in_buf = self._in_buf
+        size = self._in_buf_size
+        end = self._in_start + self._in_len
+        if end >= size:
+            end -= size
+        for byte in bytes_in:
+            in_buf[end] = byte
+            end += 1
+            if end == size:
+                end = 0
+        num = len(bytes_in)
+        self._in_len += num
+        del bytes_in
+        return num
+
+    def _consume_in_buf(self, num: int) -> None:
+        self._in_len -= num
+        if self._in_len:
+            self._in_start = (self._in_start + num) % self._in_buf_size
+        else:
+            self._in_start = 0
+
+    def _parse_raw_in_buf(self) -> int:
+        """Decode the first message in the ring buffer as a packed ``int``
+        and remove its bytes, -1 for nothing (or an incomplete message).
+        """
+        in_buf = self._in_buf
+        size = self._in_buf_size
+        while self._in_len:
+            start = self._in_start
+            status = in_buf[start]
+
+            # Leading data bytes, including the body of a dropped SysEx
+            if not status & 0x80:
+                self._consume_in_buf(1)
+                self._skipped_bytes += 1
+                continue
+
+            if status < 0xF0:
+                length = _RAW_VOICE_LENGTH[status >> 4]
+            else:
+                length = _RAW_SYSTEM_LENGTH[status & 0x0F]
+                if not length:
+                    # SysEx start or end
+                    self._consume_in_buf(1)
+                    continue
+
+            if self._in_len < length:
+                # Incomplete, wait for more
+                return -1
+
+            event = status << 16
+            bad_data = False
+            if length > 1:
+                start += 1
+                if start == size:
+                    start = 0
+                data = in_buf[start]
+                bad_data = data & 0x80
+                event |= data << 8
+                if length > 2:
+                    start += 1
+                    if start == size:
+                        start = 0
+                    data = in_buf[start]
+                    bad_data = bad_data or data & 0x80
+                    event |= data
+
+            # A status byte inside the message, drop the broken status
+            if bad_data:
+                self._consume_in_buf(1)
+                self._skipped_bytes += 1
+                continue
+
+            self._consume_in_buf(length)
+            if status < 0xF0 and not channel_filter(status & 0x0F, self._in_channel):
+                continue
+
+            return event
+
+        return -1
+
+    def _parse_in_buf(self) -> Optional[MIDIMessage]:
+        """Parse the first message in the ring buffer and remove its bytes.
+
+        Channel voice messages are decoded directly from the ring, anything
+        else goes through :func:`MIDIMessage.from_message_bytes` on a linear copy.
+        """
+        in_buf = self._in_buf
+        size = self._in_buf_size
+        while self._in_len:
+            start = self._in_start
+            status = in_buf[start]
+
+            # Leading data bytes (no running status support)
+            if not status & 0x80:
+                self._consume_in_buf(1)
+                self._skipped_bytes += 1
+                continue
+
+            # System messages and unknown ones use the general parser
+            if status >= 0xF0:
+                break
+            msgclass = MIDIMessage._class_for_status(status)
+            if msgclass is None:
+                break
+
+            length = MIDIMessage._status_to_length[status]
+            if self._in_len < length:
+                # Incomplete, wait for more
+                return None
+
+            # Copy the message out of the ring
+            msg_bytes = self._in_msg
+            bad_data = False
+            for idx in range(length):
+                byte = in_buf[start]
+                msg_bytes[idx] = byte
+                if idx and byte & 0x80:
+                    bad_data = True
+                start += 1
+                if start == size:
+                    start = 0
+
+            # A status byte inside the message, let the general parser sort it out
+            if bad_data:
+                break
+
+            self._consume_in_buf(length)
+            if not channel_filter(status & 0x0F, self._in_channel):
+                continue
+
+            try:
+                return msgclass.from_bytes(msg_bytes)
+            except (ValueError, TypeError) as ex:
+                return MIDIBadEvent(msg_bytes[:length], ex)
+
+        if not self._in_len:
+            return None
+
+        # Linearise the ring for the general parser
+        num = self._in_len
+        msg_bytes = self._in_msg
+        start = self._in_start
+        for idx in range(num):
+            msg_bytes[idx] = in_buf[start]
+            start += 1
+            if start == size:
+                start = 0
 
         (msg, endplusone, skipped) = MIDIMessage.from_message_bytes(
-            self._in_buf, self._in_channel
+            self._in_msg_view[:num], self._in_channel
         )
         if endplusone != 0:
-            # This is not particularly efficient as it's copying most of bytearray
-            # and deleting old one
-            self._in_buf = self._in_buf[endplusone:]
+            self._consume_in_buf(endplusone)
 
         self._skipped_bytes += skipped
-
-        # msg could still be None at this point, e.g. in middle of monster SysEx
         return msg
 
     def send(self, msg: MIDIMessage, channel: Optional[int] = None) -> None:
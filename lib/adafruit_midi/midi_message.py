@@ -107,6 +107,11 @@ class MIDIMessage:
         Tuple[Tuple[Optional[bytes], Optional[int]], "MIDIMessage"]
     ] = []
 
+    # Lookup tables indexed by status byte built from the list above,
+    # class (or None) and the LENGTH of that class (0 for unknown)
+    _status_to_class: List[Optional["MIDIMessage"]] = [None] * 256
+    _status_to_length: List[int] = [0] * 256
+
     def __init__(self, *, channel: Optional[int] = None) -> None:
         self._channel = channel  # dealing with pylint inadequacy
         self.channel = channel
@@ -139,6 +144,27 @@ class MIDIMessage:
         MIDIMessage._statusandmask_to_class.insert(
             insert_idx, ((cls._STATUS, cls._STATUSMASK), cls)
         )
+        MIDIMessage._update_status_tables(cls._STATUS, cls._STATUSMASK)
+
+    @staticmethod
+    def _update_status_tables(status_value: int, status_mask: int) -> None:
+        """Refresh the status byte lookup tables for the status bytes matching
+        ``status_value`` with ``status_mask``. The first (most specific) match
+        in ``_statusandmask_to_class`` wins.
+        """
+        for status in range(0x80, 256):
+            if status & status_mask != status_value:
+                continue
+            for m_type, msgclass in MIDIMessage._statusandmask_to_class:
+                if m_type[0] == status & m_type[1]:
+                    MIDIMessage._status_to_class[status] = msgclass
+                    MIDIMessage._status_to_length[status] = msgclass.LENGTH
+                    break
+
+    @staticmethod
+    def _class_for_status(status: int) -> Optional["MIDIMessage"]:
+        """Return the registered class matching a status byte or None."""
+        return MIDIMessage._status_to_class[status]
 
     # pylint: disable=too-many-arguments
     @classmethod
@@ -175,24 +201,20 @@ class MIDIMessage:
     def _match_message_status(
         cls, buf: bytearray, msgstartidx: int, msgendidxplusone: int, endidx: int
     ) -> Tuple[Optional[Any], int, bool, bool, bool, int]:
-        msgclass = None
         status = buf[msgstartidx]
-        known_msg = False
         complete_msg = False
         bad_termination = False
 
-        # Rummage through our list looking for a status match
-        for status_mask, msgclass in MIDIMessage._statusandmask_to_class:
-            masked_status = status & status_mask[1]
-            if status_mask[0] == masked_status:
-                known_msg = True
-                # Check there's enough left to parse a complete message
-                # this value can be changed later for a var. length msgs
-                complete_msg = len(buf) - msgstartidx >= msgclass.LENGTH
-                if not complete_msg:
-                    break
-
-                if msgclass.LENGTH < 0:  # indicator of variable length message
+        # Look up the class for the status byte
+        msgclass = MIDIMessage._status_to_class[status]
+        known_msg = msgclass is not None
+        if known_msg:
+            length = MIDIMessage._status_to_length[status]
+            # Check there's enough left to parse a complete message
+            # this value can be changed later for a var. length msgs
+            complete_msg = len(buf) - msgstartidx >= length
+            if complete_msg:
+                if length < 0:  # indicator of variable length message
                     (
                         msgendidxplusone,
                         terminated_msg,
@@ -203,8 +225,7 @@ class MIDIMessage:
                     if not terminated_msg:
                         complete_msg = False
                 else:  # fixed length message
-                    msgendidxplusone = msgstartidx + msgclass.LENGTH
-                break
+                    msgendidxplusone = msgstartidx + length
 
         return (
             msgclass,
@@ -13,6 +13,7 @@ CircuitPython USB host driver for MIDI devices
 
 #import usb.core
 #import adafruit_usb_host_descriptors
+import asyncio
 import usb.core
 #import adafruit_usb_host_descriptors
 import adafruit_usb_host_midi.adafruit_usb_host_descriptors as adafruit_usb_host_descriptors
@@ -23,19 +24,36 @@ __repo__ = "https://github.com/adafruit/Adafruit_CircuitPython_USB_Host_MIDI.git
 
 DIR_IN = 0x80
 
+# Number of MIDI bytes in a USB-MIDI event packet indexed by its Code Index Number
+_CIN_LENGTH = b"\x00\x00\x02\x03\x03\x01\x02\x03\x03\x03\x03\x03\x02\x02\x03\x01"
+# The same for read_events(), 0 for packets it drops (reserved and SysEx)
+_CIN_EVENT_LENGTH = b"\x00\x00\x02\x03\x00\x01\x00\x00\x03\x03\x03\x03\x02\x02\x03\x01"
+
 
 class MIDI:
     """
     Stream-like MIDI device for use with ``adafruit_midi`` and similar upstream
     MIDI parser libraries.
 
+    Each USB transfer holds up to 16 four byte USB-MIDI event packets
+    (cable number and Code Index Number, then up to three MIDI bytes).
+    ``read`` strips the packet headers and returns the MIDI byte stream,
+    ``read_events`` decodes the packets straight into packed events.
+
     :param device: a ``usb.core.Device`` object which implements
         ``read(endpoint, buffer)`` and ``write(endpoint,buffer)``
     :param float timeout: timeout in seconds to wait for read or write operation
         to succeeds. Default to None, i.e. reads and writes will block.
+        Use a near-zero timeout (e.g. 0.001) with ``read_async`` and ``read_events_async``.
+    :param float poll_interval_min: shortest sleep in seconds between the polls
+        of the async reads, used while MIDI data is flowing. Default 0.0005.
+    :param float poll_interval_max: longest sleep in seconds between the polls
+        of the async reads, reached while the device stays idle. Default 0.004.
     """
 
-    def __init__(self, device, timeout=None):
+    def __init__(
+        self, device, timeout=None, *, poll_interval_min=0.0005, poll_interval_max=0.004
+    ):
         self.interface_number = 0
         self.in_ep = 0
         self.out_ep = 0
@@ -45,6 +63,13 @@ class MIDI:
         self.buf = bytearray(64)
         self.start = 0
         self._remaining = 0
+        # Packets not yet decoded by read_events()
+        self._packet_pos = 0
+        self._packet_end = 0
+        # Sleep between the polls of the async reads, adapted to the traffic
+        self._poll_interval_min = poll_interval_min
+        self._poll_interval_max = poll_interval_max
+        self.poll_interval = poll_interval_min
 
         config_descriptor = adafruit_usb_host_descriptors.get_configuration_descriptor(
             device, 0
@@ -98,8 +123,8 @@ class MIDI:
         if self._remaining == 0:
             try:
                 n = self.device.read(self.in_ep, self.buf, self.timeout_ms)
-                self._remaining = n - 1
-                self.start = 1
+                self._remaining = self._unpack_packets(n)
+                self.start = 0
             except usb.core.USBTimeoutError:
                 pass
         size = min(size, self._remaining)
@@ -108,6 +133,104 @@ class MIDI:
         self._remaining -= size
         return b
 
+    def _unpack_packets(self, nbytes):
+        """Move the MIDI bytes of the event packets in ``self.buf`` to its start.
+
+        :return: number of MIDI bytes
+        :rtype: int
+        """
+        buf = self.buf
+        out = 0
+        for pos in range(0, nbytes - 3, 4):
+            length = _CIN_LENGTH[buf[pos] & 0x0F]
+            for i in range(1, length + 1):
+                buf[out] = buf[pos + i]
+                out += 1
+        return out
+
+    def read_events(self, events, budget=None):
+        """Decode USB-MIDI event packets into ``events`` without a byte stream
+        parser. Each message is stored as a packed ``int``,
+        ``cable << 24 | status << 16 | data1 << 8 | data2`` with missing data
+        bytes as 0. SysEx packets are dropped. A new transfer is read only when
+        all the packets of the previous one have been decoded.
+
+        :param events: A preallocated mutable sequence of ``int``,
+            e.g. an ``array.array("L")`` or a list.
+        :param int budget: Maximum number of messages to decode,
+            defaults to ``len(events)``.
+        :return: number of events written to ``events``
+        :rtype: int
+        """
+        if budget is None or budget > len(events):
+            budget = len(events)
+
+        if self._packet_pos >= self._packet_end:
+            self._packet_pos = 0
+            self._packet_end = 0
+            try:
+                # Whole packets only
+                self._packet_end = self.device.read(self.in_ep, self.buf, self.timeout_ms) & ~3
+            except usb.core.USBTimeoutError:
+                return 0
+
+        buf = self.buf
+        pos = self._packet_pos
+        end = self._packet_end
+        count = 0
+        while pos < end and count < budget:
+            header = buf[pos]
+            length = _CIN_EVENT_LENGTH[header & 0x0F]
+            status = buf[pos + 1]
+            # CIN 5 and 0xF may carry the end of a SysEx or a data byte
+            if length and status & 0x80 and status != 0xF0 and status != 0xF7:
+                event = (header & 0xF0) << 20 | status << 16
+                if length > 1:
+                    event |= buf[pos + 2] << 8
+                    if length > 2:
+                        event |= buf[pos + 3]
+                events[count] = event
+                count += 1
+            pos += 4
+
+        self._packet_pos = pos
+        return count
+
+    def _adapt_poll_interval(self, received):
+        if received:
+            self.poll_interval = self._poll_interval_min
+        else:
+            self.poll_interval = min(self.poll_interval * 2, self._poll_interval_max)
+
+    async def read_async(self, size):
+        """Awaitable ``read``. The device is polled with the (near-zero) timeout
+        and the task sleeps between polls, so other tasks keep running while
+        the device is idle. The sleep is short while data is flowing and grows
+        up to ``poll_interval_max`` while the device stays idle.
+
+        :return: Data read
+        :rtype: bytes
+        """
+        while True:
+            b = self.read(size)
+            self._adapt_poll_interval(b)
+            if b:
+                return b
+            await asyncio.sleep(self.poll_interval)
+
+    async def read_events_async(self, events, budget=None):
+        """Awaitable ``read_events``, polling the device like ``read_async``.
+
+        :return: number of events written to ``events``
+        :rtype: int
+        """
+        while True:
+            count = self.read_events(events, budget)
+            self._adapt_poll_interval(count)
+            if count:
+                return count
+            await asyncio.sleep(self.poll_interval)
+
     def readinto(self, buf):
         """Read bytes into the ``buf``. Read at most ``len(buf)`` bytes.
 
@@ -0,0 +1,207 @@
+############################################################################
+# YMF825 sound data codec
+# FUNCTION:
+#   Encoders and data formats shared by PicoYMF825_USB2W.py (in the lib
+#   folder of PICO2W) and the tools on a PC, so that both use the same code:
+#     CEQ encoder, equalizer response, binary sound patch, sound bank file
+#     and JSON sound file.
+#
+# CEQ FORMAT:
+#   Equalizer coefficient as 24bit two's complement,
+#   sign + 3bit integer + 20bit fraction.
+############################################################################
+import math
+import struct
+
+# Equalizer coefficient (CEQ) in fixed point: 1.0, max and min
+CEQ_ONE = 0x100000
+CEQ_MAX = 0x7FFFFF
+CEQ_MIN = -0x800000
+
+# CEQ of a coefficient as a 24bit integer (rounded and saturated)
+def encode_ceq(ceq):
+    val = round(ceq * CEQ_ONE)
+    if val > CEQ_MAX:
+        val = CEQ_MAX
+    elif val < CEQ_MIN:
+        val = CEQ_MIN
+
+    return val & 0xFFFFFF
+
+# Signed value of a CEQ
+def ceq_value(ceq):
+    return ceq - 0x1000000 if ceq & 0x800000 else ceq
+
+# Coefficient in a CEQ block (15 bytes: CEQ0..4 of a filter, 3 bytes each in big endian)
+def ceq_block_value(block, ceq_num):
+    pos = ceq_num * 3
+    return ceq_value((block[pos] << 16) | (block[pos + 1] << 8) | block[pos + 2]) / CEQ_ONE
+
+# Sampling frequency of YMF825 (kHz, the cutoff frequencies are in kHz)
+SAMPLING_FREQ = 48.000
+
+# Magnitude (dB) of biquad filters in cascade at a frequency (kHz).
+#   coefficients:: [(b0, b1, b2, a1, a2)] of the filters,
+#                  H(z) = (b0 + b1 z^-1 + b2 z^-2) / (1 - a1 z^-1 - a2 z^-2)
+def cascade_magnitude(coefficients, freq):
+    w = math.pi * 2 * freq / SAMPLING_FREQ
+    cos1 = math.cos(w)
+    sin1 = math.sin(w)
+    cos2 = math.cos(w * 2)
+    sin2 = math.sin(w * 2)
+
+    db = 0.0
+    for b0, b1, b2, a1, a2 in coefficients:
+        num_re = b0 + b1 * cos1 + b2 * cos2
+        num_im = -(b1 * sin1 + b2 * sin2)
+        den_re = 1.0 - a1 * cos1 - a2 * cos2
+        den_im = a1 * sin1 + a2 * sin2
+        power = (num_re * num_re + num_im * num_im) / (den_re * den_re + den_im * den_im)
+        db += 10.0 * math.log10(max(power, 1e-20))
+
+    return db
+
+# Dot row (0: top) of a magnitude (dB) in a curve of height dots
+def curve_row(db, height, db_max=12.0, db_min=-36.0):
+    db = min(db_max, max(db_min, db))
+    return int(round((db_max - db) * (height - 1) / (db_max - db_min)))
+
+# Tone image of a sound (bytes)
+TONE_BYTES = 30
+
+# Binary sound patch: offsets in PATCH_SIZE bytes (little endian)
+PATCH_MAGIC = b'Y825'
+PATCH_VERSION = 1
+PATCH_SIZE = 200
+PATCH_FLAGS = 5					# Flags
+PATCH_COMPILED = 0x01			#   The tone image and the CEQ blocks are made
+PATCH_NAME = 6					# Sound name (12 characters, padded with NUL)
+PATCH_TONE = 18					# Tone image (30 bytes)
+PATCH_CEQ = 48					# CEQ blocks of the 3 equalizers (15 bytes each)
+PATCH_GENERAL = 93				# GENERAL values (a byte each, GENERAL_NAMES order)
+PATCH_OPERATORS = 96			# OPERATORS values (a byte each, 4 operators in a row, OPERATOR_NAMES order)
+PATCH_EQ_TYPE = 164				# Equalizer types (3 bytes)
+PATCH_EQ_CURSOR = 167			# Equalizer cursors (3 bytes)
+PATCH_EQ_CUTOFF = 170			# Cutoff frequencies x 10000 (3 uint32)
+PATCH_EQ_Q = 182				# Q factors x 10000 (3 uint32)
+PATCH_JSON_CRC = 194			# crc32 of the JSON sound file (uint32)
+
+# Parameter names in the sound files
+GENERAL_NAMES = ['OCTV', 'ALGO', 'LFO ']
+OPERATOR_NAMES = ['WAVE', 'FREQ', 'DETU', 'LEVL', 'FDBK', 'ATCK', 'DECY', 'SUSL', 'SUSR', 'RELS',
+                  'VIBE', 'VIBD', 'AMPE', 'AMPM', 'KYSE', 'KSLV', 'IGOF']
+EQUALIZER_NAMES = ['TYPE', 'FREQ', 'Qfct', '<-->']
+SAVE_NAMES = ['BANK', 'NUM.', 'NAME', '<-->', 'SAVE']
+
+# Sound bank file: header, slot table and records of binary sound patches
+BANK_MAGIC = b'Y8BK'
+BANK_VERSION = 1
+BANK_HEADER_SIZE = 16			# Magic, version, reserved, record size (uint16), records (uint16)
+BANK_SLOTS = 1000				# Record index (uint16) for each sound number
+BANK_EMPTY = 0xFFFF				# No sound in a slot
+BANK_TABLE = BANK_HEADER_SIZE
+BANK_RECORDS = BANK_HEADER_SIZE + BANK_SLOTS * 2
+
+# Sound name in a binary sound patch
+def patch_name(buf):
+    return bytes(buf[PATCH_NAME:PATCH_NAME + 12]).decode().rstrip('\x00')
+
+# Clear a binary sound patch (not compiled)
+def clear_patch(buf):
+    buf[0:4] = PATCH_MAGIC
+    buf[4] = PATCH_VERSION
+    for pos in range(5, PATCH_SIZE):
+        buf[pos] = 0x00
+
+# True if buf is a binary sound patch of this version
+def is_patch(buf):
+    return buf[0:4] == PATCH_MAGIC and buf[4] == PATCH_VERSION
+
+# True if the tone image and the CEQ blocks are made in a binary sound patch
+def is_compiled(buf):
+    return (buf[PATCH_FLAGS] & PATCH_COMPILED) != 0
+
+# Set the parameter values not in the binary sound patch format
+#   name:: sound name
+#   general:: GENERAL values in GENERAL_NAMES order
+#   operators:: OPERATORS values ([4 operators]) in OPERATOR_NAMES order
+#   equalizers:: EQUALIZERS values ([3 equalizers]) in EQUALIZER_NAMES order
+def set_patch_values(buf, name, general, operators, equalizers):
+    for pos in range(12):
+        buf[PATCH_NAME + pos] = ord(name[pos]) if pos < len(name) else 0x00
+
+    for idx in range(len(GENERAL_NAMES)):
+        buf[PATCH_GENERAL + idx] = general[idx]
+
+    for idx in range(len(OPERATOR_NAMES)):
+        for opr in range(4):
+            buf[PATCH_OPERATORS + idx * 4 + opr] = operators[idx][opr]
+
+    for eqno in range(3):
+        buf[PATCH_EQ_TYPE + eqno] = equalizers[0][eqno]
+        struct.pack_into('<I', buf, PATCH_EQ_CUTOFF + eqno * 4, round(equalizers[1][eqno] * 10000))
+        struct.pack_into('<I', buf, PATCH_EQ_Q + eqno * 4, round(equalizers[2][eqno] * 10000))
+        buf[PATCH_EQ_CURSOR + eqno] = equalizers[3][eqno]
+
+# Equalizer values in a binary sound patch: [types, cutoffs, Q factors, cursors]
+def patch_equalizers(buf):
+    return [
+        list(buf[PATCH_EQ_TYPE:PATCH_EQ_TYPE + 3]),
+        [struct.unpack_from('<I', buf, PATCH_EQ_CUTOFF + eqno * 4)[0] / 10000 for eqno in range(3)],
+        [struct.unpack_from('<I', buf, PATCH_EQ_Q + eqno * 4)[0] / 10000 for eqno in range(3)],
+        list(buf[PATCH_EQ_CURSOR:PATCH_EQ_CURSOR + 3])
+    ]
+
+# Binary sound patch (not compiled) of a JSON sound file data in buf.
+#   defaults:: binary sound patch of the parameters missing in the file.
+#              If None, a missing GENERAL or OPERATORS parameter raises KeyError,
+#              the equalizers missing are ALL PASS.
+def json_to_patch(file_data, buf, defaults=None):
+    values = {}
+    for parm in file_data:
+        values[(parm['target'], parm['name'])] = parm['value']
+
+    if defaults is None:
+        for name in GENERAL_NAMES:
+            if ('GENERAL', name) not in values:
+                raise KeyError('GENERAL ' + name)
+
+        for name in OPERATOR_NAMES:
+            if ('OPERATORS', name) not in values:
+                raise KeyError('OPERATORS ' + name)
+
+        clear_patch(buf)
+        set_patch_values(buf, '', [0] * len(GENERAL_NAMES), [[0, 0, 0, 0]] * len(OPERATOR_NAMES),
+            [[0, 0, 0], [1.0, 1.0, 1.0], [0.707, 0.707, 0.707], [1, 1, 1]])
+
+    else:
+        buf[:] = defaults
+        buf[PATCH_FLAGS] = 0x00
+        struct.pack_into('<I', buf, PATCH_JSON_CRC, 0)
+
+    equalizers = patch_equalizers(buf)
+    set_patch_values(buf,
+        values.get(('SAVE', 'NAME'), patch_name(buf)),
+        [values.get(('GENERAL', GENERAL_NAMES[idx]), buf[PATCH_GENERAL + idx]) for idx in range(len(GENERAL_NAMES))],
+        [values.get(('OPERATORS', OPERATOR_NAMES[idx]), list(buf[PATCH_OPERATORS + idx * 4:PATCH_OPERATORS + idx * 4 + 4])) for idx in range(len(OPERATOR_NAMES))],
+        [values.get(('EQUALIZERS', EQUALIZER_NAMES[idx]), equalizers[idx]) for idx in range(len(EQUALIZER_NAMES))])
+    return buf
+
+# JSON sound file data of a binary sound patch
+def patch_to_json(buf, bank, number):
+    file_data = []
+    for idx in range(len(GENERAL_NAMES)):
+        file_data.append({'target': 'GENERAL', 'name': GENERAL_NAMES[idx], 'value': buf[PATCH_GENERAL + idx]})
+
+    for idx in range(len(OPERATOR_NAMES)):
+        pos = PATCH_OPERATORS + idx * 4
+        file_data.append({'target': 'OPERATORS', 'name': OPERATOR_NAMES[idx], 'value': list(buf[pos:pos + 4])})
+
+    equalizers = patch_equalizers(buf)
+    for idx in range(len(EQUALIZER_NAMES)):
+        file_data.append({'target': 'EQUALIZERS', 'name': EQUALIZER_NAMES[idx], 'value': equalizers[idx]})
+
+    for name, value in zip(SAVE_NAMES, [bank, number, patch_name(buf), 0, 0]):
+        file_data.append({'target': 'SAVE', 'name': name, 'value': value})
+
+    return file_data
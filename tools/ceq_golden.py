@@ -0,0 +1,126 @@
+############################################################################
+# YMF825 equalizer coefficient (CEQ) encoder check on a PC
+# FUNCTION:
+#   Compare the fixed point CEQ encoder of PicoYMF825_USB2W.py
+#   (encode_ceq in lib/ymf825_codec.py, used by YMF825_class.set_ceq)
+#   with the string based encoder used before it
+#   (dec2bin_frac and make_ceq_bytes in send_equalizer_parameters).
+#
+# USAGE:
+#   python3 tools/ceq_golden.py
+#
+# CEQ FORMAT:
+#   24bit two's complement, sign + 3bit integer + 20bit fraction.
+#   The old encoder truncated the fraction, the new one rounds it,
+#   so both differ at most 1 LSB (2^-20) except a known fault below.
+############################################################################
+import os
+import sys
+
+# The encoder in the lib folder of the synthesizer
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+from ymf825_codec import encode_ceq, ceq_value
+
+# Golden table: (coefficient, old encoder CEQ, new encoder CEQ)
+#   Coefficients are b0, b1, b2, a1 and a2 of the 6 filter types
+#   for some cutoff frequencies and Q factors, and some edge values.
+GOLDEN = [
+    (-0.4372878651563088,  0xF900DE, 0xF900DE),
+    (-0.4837489952520018,  0xF84290, 0xF84290),
+    (1.0,                  0x100000, 0x100000),
+    (0.4837489952520018,   0x07BD6F, 0x07BD70),
+    (0.4372878651563088,   0x06FF21, 0x06FF22),
+    (0.6060876823166707,   0x09B288, 0x09B289),
+    (-1.5487191335982498,  0xE73872, 0xE73872),
+    (1.5487191335982498,   0x18C78D, 0x18C78E),
+    (-0.6060876823166707,  0xF64D77, 0xF64D77),
+    (0.6876951183117592,   0x0B00CC, 0x0B00CD),
+    (-0.8438475591558798,  0xF27F99, 0xF27F9A),
+    (0.8438475591558798,   0x0D8066, 0x0D8066),
+    (-0.6876951183117592,  0xF4FF33, 0xF4FF33),
+    (0.9115817346362141,   0x0E95D6, 0x0E95D7),
+    (-1.9074888914066745,  0xE17AED, 0xE17AED),
+    (1.9074888914066745,   0x1E8513, 0x1E8513),
+    (-0.9115817346362141,  0xF16A29, 0xF16A29),
+    (0.8405994148545213,   0x0D7318, 0x0D7318),
+    (0.9202997074272602,   0x0EB98C, 0x0EB98C),
+    (-0.9202997074272602,  0xF14673, 0xF14674),
+    (-0.8405994148545213,  0xF28CE7, 0xF28CE8),
+    (0.019740784897922345, 0x0050DB, 0x0050DC),
+    (0.03948156979584469,  0x00A1B7, 0x00A1B7),
+    (0.014342137179605237, 0x003ABE, 0x003ABF),
+    (0.028684274359210473, 0x00757D, 0x00757E),
+    (0.21096188978896985,  0x036019, 0x03601A),
+    (0.4219237795779397,   0x06C033, 0x06C033),
+    (0.0010232108073849123, 0x000430, 0x000431),
+    (0.0020464216147698245, 0x000861, 0x000862),
+    (0.6902247805704453,   0x0B0B29, 0x0B0B29),
+    (1.3804495611408907,   0x161652, 0x161652),
+    (0.26161528252392324,  0x042F93, 0x042F94),
+    (-0.5232305650478465,  0xF7A0D9, 0xF7A0D9),
+    (0.7887017039787301,   0x0C9E85, 0x0C9E86),
+    (-1.5774034079574601,  0xE6C2F4, 0xE6C2F5),
+    (0.6328856693669097,   0x0A204C, 0x0A204D),
+    (-1.2657713387338194,  0xEBBF66, 0xEBBF67),
+    (0.9547676565107222,   0x0F46BA, 0x0F46BA),
+    (-1.9095353130214443,  0xE1728B, 0xE1728B),
+    (0.23007492685681524,  0x03AE63, 0x03AE63),
+    (-0.4601498537136305,  0xF8A339, 0xF8A33A),
+    (0.07186439325781545,  0x01265B, 0x01265B),
+    (0.0,                  0x000000, 0x000000),
+    (-0.07186439325781545, 0xFED9A4, 0xFED9A5),
+    (0.10635632577449892,  0x01B3A2, 0x01B3A3),
+    (-0.10635632577449892, 0xFE4C5D, 0xFE4C5D),
+    (0.36539671157524173,  0x05D8AA, 0x05D8AA),
+    (-0.36539671157524173, 0xFA2755, 0xFA2756),
+    (0.03125585680609834,  0x008006, 0x008006),
+    (-0.03125585680609834, 0xFF7FF9, 0xFF7FFA),
+    (0.39850146286369703,  0x066043, 0x066043),
+    (-0.39850146286369703, 0xF99FBC, 0xF99FBD),
+    (0.7186439325781544,   0x0B7F90, 0x0B7F91),
+    (-0.7186439325781544,  0xF4806F, 0xF4806F),
+    (0.19695615884166467,  0x0326BB, 0x0326BC),
+    (-0.19695615884166467, 0xFCD944, 0xFCD944),
+    (0.15615244084412042,  0x027F99, 0x027F9A),
+    (-0.15615244084412042, 0xFD8066, 0xFD8066),
+    (0.044209132681892985, 0x00B514, 0x00B515),
+    (-0.044209132681892985, 0xFF4AEB, 0xFF4AEB),
+    (0.07970029257273942,  0x014673, 0x014674),
+    (-0.07970029257273942, 0xFEB98C, 0xFEB98C),
+    (0.2813560674218456,   0x04806F, 0x04806F),
+    (0.8030438411583353,   0x0CD944, 0x0CD944),
+    (0.8438475591558796,   0x0D8066, 0x0D8066),
+    (0.955790867318107,    0x0F4AEB, 0x0F4AEB),
+    (0.9202997074272606,   0x0EB98C, 0x0EB98C),
+    (-1.0,                 0xF00000, 0xF00000),
+    (0.5,                  0x080000, 0x080000),
+    (-0.5,                 0xF80000, 0xF80000),
+    (-1.5,                 0xE80000, 0xE80000),
+    (2.0,                  0x200000, 0x200000),
+    (-2.0,                 0xE00000, 0xE00000),
+    (7.5,                  0x780000, 0x780000),
+    (-7.5,                 0x880000, 0x880000),
+    (0.1,                  0x019999, 0x01999A),
+    (-0.1,                 0xFE6666, 0xFE6666),
+    (1e-07,                0x000000, 0x000000),
+    (-1e-07,               0x800000, 0x000000),	# Legacy: -0.0000001 --> -8.0
+    (7.999999,             0x7FFFFE, 0x7FFFFF),
+    (-7.999999,            0x800001, 0x800001),
+]
+
+def main():
+    errors = 0
+    for coef, old, new in GOLDEN:
+        ceq = encode_ceq(coef)
+        if ceq != new:
+            print('NG: {!r} --> 0x{:06X} (expected 0x{:06X})'.format(coef, ceq, new))
+            errors = errors + 1
+
+        elif abs(ceq_value(ceq) - ceq_value(old)) > 1:
+            print('DIFF: {!r} --> 0x{:06X} (old encoder 0x{:06X})'.format(coef, ceq, old))
+
+    print('{} coefficients, {} errors.'.format(len(GOLDEN), errors))
+    return errors
+
+if __name__ == '__main__':
+    sys.exit(1 if main() else 0)
@@ -0,0 +1,203 @@
+############################################################################
+# YMF825 equalizer fitter on a PC
+# FUNCTION:
+#   Search the filter types, cutoff frequencies and Q factors of the
+#   3 equalizers to fit a target magnitude curve, and write them
+#   into sound files (SNDP*.json) the synthesizer loads.
+#   The candidates are evaluated with the coefficients quantized to
+#   the CEQ format, in a vectorized batch per equalizer.
+#
+# USAGE:
+#   python3 tools/eq_fitter.py --target 60:-6,200:0,4000:0,12000:4 \
+#           --base SYNTH/SOUND/SNDP0105.json --out SYNTH/SOUND/SNDP0106.json
+#       Fit a curve (Hz:dB points) and save it as a new sound file.
+#   python3 tools/eq_fitter.py --target-file pa.csv --library SYNTH/SOUND --out SNDP_PA
+#       Fit a curve (Hz,dB lines) and write it into all the sound files.
+#
+# REQUIREMENTS:
+#   numpy on a PC, or ulab.numpy on circuitpython (use coarse=True).
+#   On circuitpython, copy eq_fitter.py and eq_response.py into the lib
+#   folder and call fit() and apply_equalizer(), main() runs on a PC only.
+############################################################################
+import math
+import json
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    from ulab import numpy as np
+
+from eq_response import EQ_TYPES, EQ_NAME_TYPE, EQ_NAME_CUTOFF, EQ_NAME_Q
+from eq_response import frequency_grid, biquad_coefficients, quantize, biquad_response
+
+# Parameter ranges of the EQUALIZERS page
+CUTOFF_MIN = 0.02		# kHz
+CUTOFF_MAX = 22.0		# kHz (< SAMPLING_FREQ / 2)
+Q_MIN = 0.1
+Q_MAX = 10.0
+
+# Search grids: (cutoff frequencies, Q factors)
+GRID_FINE   = (96, 24)
+GRID_COARSE = (24, 8)
+
+# Geometric steps from low to high
+def geometric_steps(low, high, steps):
+    return [low * (high / low) ** (n / (steps - 1)) for n in range(steps)]
+
+# True if the quantized filter is stable: poles of 1 - a1 z^-1 - a2 z^-2 in the unit circle
+def is_stable(coefficients):
+    a1 = coefficients[3]
+    a2 = coefficients[4]
+    return abs(a2) < 1.0 and abs(a1) < 1.0 - a2
+
+# Candidate filters and their magnitude responses.
+#   Returns ([(filter type, cutoff, Q)], magnitude array (candidates, len(freqs)))
+def make_candidates(freqs, coarse=False):
+    cutoff_steps, q_steps = GRID_COARSE if coarse else GRID_FINE
+    cutoffs = geometric_steps(CUTOFF_MIN, CUTOFF_MAX, cutoff_steps)
+    q_factors = geometric_steps(Q_MIN, Q_MAX, q_steps)
+
+    # ALL PASS is flat in magnitude, one of them works as "no filter"
+    candidates = [(0, 1.0, 0.707)]
+    coefficients = [quantize(biquad_coefficients(0, 1.0, 0.707))]
+    for filter_type in range(1, len(EQ_TYPES)):
+        for cutoff in cutoffs:
+            for q in q_factors:
+                # Values as the EQUALIZERS page shows
+                setting = (filter_type, round(cutoff, 4), round(q, 4))
+                coefs = biquad_coefficients(setting[0], setting[1], setting[2])
+                if max([abs(coef) for coef in coefs]) >= 8.0:
+                    continue
+
+                coefs = quantize(coefs)
+                if is_stable(coefs):
+                    candidates.append(setting)
+                    coefficients.append(coefs)
+
+    magnitude, phase = biquad_response(np.array(coefficients), freqs)
+    return (candidates, magnitude)
+
+# Target curve on the frequency grid, interpolated in log frequency.
+#   points:: [(Hz, dB)]
+def target_curve(points, freqs):
+    points = sorted(points)
+    log_freqs = np.array([math.log10(f) for f in freqs])
+    xp = np.array([math.log10(f) for f, db in points])
+    fp = np.array([db for f, db in points])
+    return np.interp(log_freqs, xp, fp)
+
+# Fit the 3 equalizers to a target curve.
+#   The equalizers are chosen one by one for the residual of the others,
+#   and the rounds are repeated while the error decreases.
+#   Returns ([(filter type, cutoff, Q)] * 3, RMS error in dB)
+def fit(target, freqs, candidates=None, coarse=False, rounds=6):
+    if candidates is None:
+        candidates = make_candidates(freqs, coarse)
+
+    settings, magnitude = candidates
+    chosen = [0, 0, 0]
+    error = None
+    for rnd in range(rounds):
+        improved = False
+        for eq in range(3):
+            # Residual for this equalizer
+            residual = target - magnitude[chosen[(eq + 1) % 3]] - magnitude[chosen[(eq + 2) % 3]]
+            diff = magnitude - residual
+            errors = np.mean(diff * diff, axis=1)
+            best = int(np.argmin(errors))
+            if error is None or float(errors[best]) < error - 1e-9:
+                error = float(errors[best])
+                chosen[eq] = best
+                improved = True
+
+        if not improved:
+            break
+
+    return ([settings[n] for n in chosen], math.sqrt(error))
+
+# Write an equalizer into a sound file data (a list loaded from SNDP*.json)
+def apply_equalizer(file_data, equalizer, name=None):
+    for parm in file_data:
+        if parm['target'] == 'EQUALIZERS':
+            if parm['name'] == EQ_NAME_TYPE:
+                parm['value'] = [setting[0] for setting in equalizer]
+            elif parm['name'] == EQ_NAME_CUTOFF:
+                parm['value'] = [setting[1] for setting in equalizer]
+            elif parm['name'] == EQ_NAME_Q:
+                parm['value'] = [setting[2] for setting in equalizer]
+
+        elif parm['target'] == 'SAVE' and parm['name'] == 'NAME' and name is not None:
+            parm['value'] = '{:12s}'.format(name)[:12]
+
+    return file_data
+
+# Read a target curve file: a "Hz,dB" line per point
+def load_target_file(path):
+    points = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if len(line) > 0 and line[0] != '#':
+                hz, db = line.split(',')[0:2]
+                points.append((float(hz), float(db)))
+
+    return points
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='YMF825 equalizer fitter.')
+    parser.add_argument('--target', help='target curve as Hz:dB,Hz:dB,...')
+    parser.add_argument('--target-file', help='target curve file (Hz,dB lines)')
+    parser.add_argument('--base', help='base sound file')
+    parser.add_argument('--library', help='write the equalizer into all the sound files in a folder')
+    parser.add_argument('--out', help='output sound file (or folder with --library)')
+    parser.add_argument('--name', help='sound name of the output file')
+    parser.add_argument('--coarse', action='store_true', help='coarse search grid')
+    args = parser.parse_args()
+
+    if args.target_file:
+        points = load_target_file(args.target_file)
+    elif args.target:
+        points = [(float(point.split(':')[0]), float(point.split(':')[1])) for point in args.target.split(',')]
+    else:
+        parser.error('--target or --target-file is needed.')
+
+    freqs = frequency_grid()
+    target = target_curve(points, freqs)
+    candidates = make_candidates(freqs, args.coarse)
+    print('CANDIDATES:', len(candidates[0]))
+
+    equalizer, error = fit(target, freqs, candidates)
+    for eq in range(3):
+        filter_type, cutoff, q = equalizer[eq]
+        print('EQ{}: {:10s} FREQ={:7.4f} Qfct={:7.4f}'.format(eq, EQ_TYPES[filter_type], cutoff, q))
+
+    print('RMS ERROR: {:.2f} dB'.format(error))
+
+    if args.library and args.out:
+        if not os.path.isdir(args.out):
+            os.mkdir(args.out)
+
+        for file_name in sorted(os.listdir(args.library)):
+            if file_name[0:4] == 'SNDP' and file_name[-5:] == '.json':
+                with open(args.library + '/' + file_name, 'r') as f:
+                    file_data = json.load(f)
+
+                with open(args.out + '/' + file_name, 'w') as f:
+                    json.dump(apply_equalizer(file_data, equalizer), f)
+
+                print('SAVED:', args.out + '/' + file_name)
+
+    elif args.base and args.out:
+        with open(args.base, 'r') as f:
+            file_data = json.load(f)
+
+        with open(args.out, 'w') as f:
+            json.dump(apply_equalizer(file_data, equalizer, args.name), f)
+
+        print('SAVED:', args.out)
+
+if __name__ == '__main__':
+    main()
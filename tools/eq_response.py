@@ -0,0 +1,247 @@
+############################################################################
+# YMF825 equalizer frequency response on a PC
+# FUNCTION:
+#   Magnitude and phase response of the 3 biquad filters cascade
+#   of YMF825 (EQUALIZERS page of PicoYMF825_USB2W.py).
+#   The coefficients are quantized to the CEQ format as the chip gets them.
+#
+# USAGE:
+#   python3 tools/eq_response.py SYNTH/SOUND/SNDP0105.json
+#       Response of a sound file.
+#   python3 tools/eq_response.py --library SYNTH/SOUND
+#       Score all the sound files in a folder.
+#   python3 tools/eq_response.py --oled SYNTH/SOUND/SNDP0105.json
+#       Downsampled curve for the OLED (128x64 dots).
+#
+# REQUIREMENTS:
+#   numpy on a PC, or ulab.numpy on circuitpython.
+############################################################################
+import math
+import json
+import os
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    from ulab import numpy as np
+
+# The CEQ encoder in the lib folder of the synthesizer
+#   (circuitpython has no os.path, the lib folder is in sys.path already)
+if hasattr(os, 'path'):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+
+from ymf825_codec import encode_ceq, ceq_value, CEQ_ONE, SAMPLING_FREQ, curve_row
+
+# Filter types as PARM_TEXT_EQTYPE in PicoYMF825_USB2W.py
+EQ_TYPES = ['ALL PASS', 'LPF', 'HPF', 'BPF:skirt', 'BPF:0db', 'NOTCH']
+
+# Equalizer parameter names in the sound files
+EQ_NAME_TYPE   = 'TYPE'
+EQ_NAME_CUTOFF = 'FREQ'
+EQ_NAME_Q      = 'Qfct'
+
+# Default frequency grid (Hz): 20Hz..20kHz in log scale
+def frequency_grid(points=256, low=20.0, high=20000.0):
+    return np.array([low * (high / low) ** (n / (points - 1)) for n in range(points)])
+
+# Biquad filter coefficients (b0, b1, b2, a1, a2), same as YMF825_class.calc_biquad_filter()
+def biquad_coefficients(filter_type, cutoff_freq, q_factor):
+    if q_factor < 0.01:
+        q_factor = 0.01
+
+    w0 = math.pi * 2 * cutoff_freq / SAMPLING_FREQ
+    alpha = math.sin(w0) / (q_factor + q_factor)
+    cosw0 = math.cos(w0)
+    a0 = 1.0 + alpha
+    a1 = cosw0 * 2 / a0
+    a2 = (alpha - 1.0) / a0
+
+    filter_name = EQ_TYPES[filter_type]
+    if filter_name == 'LPF':
+        b0 = (1.0 - cosw0) / (a0 + a0)
+        b1 = (1.0 - cosw0) / a0
+        b2 = b0
+
+    elif filter_name == 'HPF':
+        b0 = (1.0 + cosw0) / (a0 + a0)
+        b1 = -(1.0 + cosw0) / a0
+        b2 = b0
+
+    elif filter_name == 'BPF:skirt':
+        b0 = q_factor * alpha / a0
+        b1 = 0
+        b2 = -b0
+
+    elif filter_name == 'BPF:0db':
+        b0 = alpha / a0
+        b1 = 0
+        b2 = -b0
+
+    elif filter_name == 'NOTCH':
+        b0 = 1 / a0
+        b1 = -2 * cosw0 / a0
+        b2 = b0
+
+    else:
+        b0 = (1 - alpha) / a0
+        b1 = -2 * cosw0 / a0
+        b2 = (1 + alpha) / a0
+
+    return (b0, b1, b2, a1, a2)
+
+# Coefficients as YMF825 gets them (CEQ format)
+def quantize(coefficients):
+    return [ceq_value(encode_ceq(coef)) / CEQ_ONE for coef in coefficients]
+
+# Quantized coefficients of the 3 filters
+#   equalizer:: [(filter type, cutoff kHz, Q factor)] * 3
+def equalizer_coefficients(equalizer):
+    return [quantize(biquad_coefficients(filter_type, cutoff, q)) for filter_type, cutoff, q in equalizer]
+
+# Frequency response of biquad filters.
+#   coefficients:: array (..., 5) of b0, b1, b2, a1, a2
+#                  H(z) = (b0 + b1 z^-1 + b2 z^-2) / (1 - a1 z^-1 - a2 z^-2)
+#   freqs:: frequency grid (Hz)
+#   Returns (magnitude in dB, phase in radian), arrays (..., len(freqs)).
+#   Real arithmetic and 2 dimensional arrays only for ulab.
+def biquad_response(coefficients, freqs):
+    coefficients = np.array(coefficients)
+    shape = coefficients.shape
+    filters = coefficients.size // 5
+    coefficients = coefficients.reshape((filters, 5))
+
+    w = freqs * (math.pi * 2 / (SAMPLING_FREQ * 1000.0))
+    cos1 = np.cos(w)
+    sin1 = np.sin(w)
+    cos2 = np.cos(w * 2)
+    sin2 = np.sin(w * 2)
+
+    b0 = coefficients[:, 0].reshape((filters, 1))
+    b1 = coefficients[:, 1].reshape((filters, 1))
+    b2 = coefficients[:, 2].reshape((filters, 1))
+    a1 = coefficients[:, 3].reshape((filters, 1))
+    a2 = coefficients[:, 4].reshape((filters, 1))
+
+    num_re = b0 + b1 * cos1 + b2 * cos2
+    num_im = -(b1 * sin1 + b2 * sin2)
+    den_re = 1.0 - a1 * cos1 - a2 * cos2
+    den_im = a1 * sin1 + a2 * sin2
+
+    power = (num_re * num_re + num_im * num_im) / (den_re * den_re + den_im * den_im)
+    magnitude = 10.0 * np.log10(np.maximum(power, 1e-20))
+    phase = np.arctan2(num_im, num_re) - np.arctan2(den_im, den_re)
+
+    shape = tuple(shape[:-1]) + (len(freqs),)
+    return (magnitude.reshape(shape), phase.reshape(shape))
+
+# Frequency response of the 3 filters cascade.
+#   coefficients:: array (3, 5) or (sounds, 3, 5), the filters are summed up in dB and radian
+#   Returns (magnitude in dB, phase in radian), arrays (len(freqs),) or (sounds, len(freqs)).
+def cascade_response(coefficients, freqs):
+    coefficients = np.array(coefficients)
+    sounds = coefficients.size // 15
+    magnitude, phase = biquad_response(coefficients.reshape((sounds * 3, 5)), freqs)
+    magnitude = magnitude[0::3] + magnitude[1::3] + magnitude[2::3]
+    phase = phase[0::3] + phase[1::3] + phase[2::3]
+    if len(coefficients.shape) == 2:
+        return (magnitude[0], phase[0])
+
+    return (magnitude, phase)
+
+# Equalizer settings in a sound file: [(filter type, cutoff, Q)] * 3
+def load_equalizer(path):
+    with open(path, 'r') as f:
+        file_data = json.load(f)
+
+    values = {}
+    name = ''
+    for parm in file_data:
+        if parm['target'] == 'EQUALIZERS':
+            values[parm['name']] = parm['value']
+        elif parm['target'] == 'SAVE' and parm['name'] == 'NAME':
+            name = parm['value']
+
+    equalizer = [(values[EQ_NAME_TYPE][eq], values[EQ_NAME_CUTOFF][eq], values[EQ_NAME_Q][eq]) for eq in range(3)]
+    return (name, equalizer)
+
+# Sound files in a folder: [(file name, sound name, equalizer)]
+def load_library(folder):
+    library = []
+    for file_name in sorted(os.listdir(folder)):
+        if file_name[0:4] == 'SNDP' and file_name[-5:] == '.json':
+            try:
+                name, equalizer = load_equalizer(folder + '/' + file_name)
+                library.append((file_name, name, equalizer))
+
+            except (OSError, ValueError, KeyError, IndexError):
+                print('SKIP:', file_name)
+
+    return library
+
+# Score all the sound files in a folder at once.
+#   Returns [(file name, sound name, peak dB, peak Hz, dip dB, dip Hz, flatness dB RMS)]
+def score_library(folder, freqs=None):
+    if freqs is None:
+        freqs = frequency_grid()
+
+    library = load_library(folder)
+    if len(library) == 0:
+        return []
+
+    coefficients = np.array([equalizer_coefficients(equalizer) for file_name, name, equalizer in library])
+    magnitude, phase = cascade_response(coefficients, freqs)
+
+    scores = []
+    for n in range(len(library)):
+        mag = magnitude[n]
+        peak = int(np.argmax(mag))
+        dip = int(np.argmin(mag))
+        flatness = float(np.sqrt(np.mean(mag * mag)))
+        scores.append((library[n][0], library[n][1], float(mag[peak]), float(freqs[peak]), float(mag[dip]), float(freqs[dip]), flatness))
+
+    return scores
+
+# Downsampled magnitude curve for the OLED (the EQUALIZERS page draws the same scale).
+#   Returns a bytearray of the dot row (0: top) for each column.
+def oled_curve(magnitude, width=128, height=64, db_max=12.0, db_min=-36.0):
+    curve = bytearray(width)
+    points = len(magnitude)
+    for col in range(width):
+        # Average of the points in the column
+        start = col * points // width
+        end = max(start + 1, (col + 1) * points // width)
+        curve[col] = curve_row(float(np.mean(magnitude[start:end])), height, db_max, db_min)
+
+    return curve
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='YMF825 equalizer frequency response.')
+    parser.add_argument('files', nargs='*', help='sound files (SNDP*.json)')
+    parser.add_argument('--library', help='score all the sound files in a folder')
+    parser.add_argument('--oled', action='store_true', help='print the OLED curve')
+    parser.add_argument('--points', type=int, default=32, help='frequency points to print')
+    args = parser.parse_args()
+
+    if args.library:
+        print('{:14s} {:12s} {:>8s} {:>8s} {:>8s} {:>8s} {:>8s}'.format('FILE', 'NAME', 'PEAK dB', 'Hz', 'DIP dB', 'Hz', 'RMS dB'))
+        for score in sorted(score_library(args.library), key=lambda score: score[6]):
+            print('{:14s} {:12s} {:8.2f} {:8.0f} {:8.2f} {:8.0f} {:8.2f}'.format(*score))
+
+    for path in args.files:
+        name, equalizer = load_equalizer(path)
+        print(path, name, equalizer)
+        if args.oled:
+            magnitude, phase = cascade_response(np.array(equalizer_coefficients(equalizer)), frequency_grid())
+            print('OLED:', list(oled_curve(magnitude)))
+
+        else:
+            freqs = frequency_grid(args.points)
+            magnitude, phase = cascade_response(np.array(equalizer_coefficients(equalizer)), freqs)
+            for n in range(len(freqs)):
+                print('{:8.1f}Hz {:8.2f}dB {:8.1f}deg'.format(float(freqs[n]), float(magnitude[n]), float(phase[n]) * 180.0 / math.pi))
+
+if __name__ == '__main__':
+    main()
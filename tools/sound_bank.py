@@ -0,0 +1,136 @@
+############################################################################
+# YMF825 sound bank file converter on a PC
+# FUNCTION:
+#   Convert the JSON sound files (SNDP*.json) of a bank into a sound bank
+#   file (BANK*.ymb) PicoYMF825_USB2W.py reads and writes a sound with
+#   a seek, and export a sound bank file to the JSON sound files.
+#   The sounds converted here have the parameter values only, the
+#   synthesizer makes their tone images and CEQ blocks at the first load
+#   and writes them back to the sound bank file.
+#
+# USAGE:
+#   python3 tools/sound_bank.py migrate SYNTH/SOUND 9
+#       Make SYNTH/SOUND/BANK9.ymb from SYNTH/SOUND/SNDP9*.json.
+#       Remove or move the JSON files of the bank afterwards, the
+#       synthesizer ignores them while the sound bank file exists.
+#       A JSON file missing a GENERAL or OPERATORS parameter is skipped.
+#   python3 tools/sound_bank.py export SYNTH/SOUND/BANK9.ymb out
+#       Write the sounds in BANK9.ymb to out/SNDP9*.json.
+#   python3 tools/sound_bank.py list SYNTH/SOUND/BANK9.ymb
+#       List the sounds in a sound bank file.
+#
+# FILE FORMAT (little endian):
+#   Header (16 bytes): 'Y8BK', version, reserved, record size (uint16), records (uint16)
+#   Slot table: record index (uint16, 0xFFFF: no sound) for 1000 sound numbers
+#   Records: binary sound patches (lib/ymf825_codec.py) in the order written
+############################################################################
+import os
+import sys
+import json
+import struct
+
+# Sound file formats shared with PicoYMF825_USB2W.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+from ymf825_codec import (BANK_MAGIC, BANK_VERSION, BANK_HEADER_SIZE, BANK_SLOTS, BANK_EMPTY, BANK_TABLE, BANK_RECORDS,
+                          PATCH_SIZE, json_to_patch, patch_to_json, patch_name, is_compiled)
+
+# Sound file names
+def json_file_name(bank, number):
+    return 'SNDP' + str(bank) + '{:03d}'.format(number) + '.json'
+
+def bank_file_name(bank):
+    return 'BANK' + str(bank) + '.ymb'
+
+# Write a sound bank file.
+#   patches:: {sound number: binary sound patch}
+def write_bank(path, patches):
+    header = bytearray(BANK_HEADER_SIZE)
+    header[0:4] = BANK_MAGIC
+    header[4] = BANK_VERSION
+    struct.pack_into('<H', header, 6, PATCH_SIZE)
+    struct.pack_into('<H', header, 8, len(patches))
+
+    table = bytearray([0xFF] * (BANK_SLOTS * 2))
+    numbers = sorted(patches)
+    for idx in range(len(numbers)):
+        struct.pack_into('<H', table, numbers[idx] * 2, idx)
+
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(table)
+        for number in numbers:
+            f.write(patches[number])
+
+# Read a sound bank file: {sound number: binary sound patch}
+def read_bank(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if data[0:4] != BANK_MAGIC or data[4] != BANK_VERSION:
+        raise ValueError('Not a sound bank file: ' + path)
+
+    record_size = struct.unpack_from('<H', data, 6)[0]
+    patches = {}
+    for number in range(BANK_SLOTS):
+        idx = struct.unpack_from('<H', data, BANK_TABLE + number * 2)[0]
+        if idx != BANK_EMPTY:
+            pos = BANK_RECORDS + idx * record_size
+            patches[number] = data[pos:pos + record_size]
+
+    return patches
+
+# Make a sound bank file from the JSON sound files of a bank in a folder
+def migrate(folder, bank):
+    patches = {}
+    for file_name in sorted(os.listdir(folder)):
+        if file_name[0:5] == 'SNDP' + str(bank) and file_name[-5:] == '.json':
+            try:
+                with open(folder + '/' + file_name, 'r') as f:
+                    patches[int(file_name[5:8])] = json_to_patch(json.load(f), bytearray(PATCH_SIZE))
+
+                print('MIGRATE:', file_name)
+
+            except (OSError, ValueError, KeyError, IndexError, TypeError):
+                print('SKIP:', file_name)
+
+    path = folder + '/' + bank_file_name(bank)
+    write_bank(path, patches)
+    print('SAVED:', path, len(patches), 'sounds')
+
+# Write the sounds in a sound bank file to JSON sound files
+def export(path, folder):
+    bank = int(os.path.basename(path)[4])
+    if not os.path.isdir(folder):
+        os.mkdir(folder)
+
+    patches = read_bank(path)
+    for number in sorted(patches):
+        out = folder + '/' + json_file_name(bank, number)
+        with open(out, 'w') as f:
+            json.dump(patch_to_json(patches[number], bank, number), f)
+
+        print('SAVED:', out)
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='YMF825 sound bank file converter.')
+    parser.add_argument('command', choices=['migrate', 'export', 'list'])
+    parser.add_argument('path', help='sound folder (migrate) or sound bank file (export, list)')
+    parser.add_argument('arg', nargs='?', help='bank number (migrate) or output folder (export)')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        migrate(args.path, int(args.arg))
+
+    elif args.command == 'export':
+        export(args.path, args.arg if args.arg else '.')
+
+    else:
+        patches = read_bank(args.path)
+        for number in sorted(patches):
+            compiled = 'COMPILED' if is_compiled(patches[number]) else ''
+            print('{:03d}: {:12s} {}'.format(number, patch_name(patches[number]), compiled))
+
+if __name__ == '__main__':
+    main()